@@ -11,7 +11,7 @@ from alembic import context
 from app.core.config import settings
 from app.db.base import Base
 
-from app.models import user, product, product_category, product_subcategory, shop, inventory, order, cart_suggestion, agent, shop_category, notification
+from app.models import user, product, product_category, product_subcategory, shop, inventory, order, cart_suggestion, agent, shop_category, notification, stock_hold, ocr_job, ocr_cache
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -4,6 +4,7 @@ from pydantic import BaseModel, Field
 
 from app.db.session import get_db
 from app.utils.auth import get_current_user
+from app.utils.ws_auth import principal_cache
 from app.models.user import User, UserRole
 from app.models.shop import Shop, OnboardingStep
 from app.models.agent import Agent
@@ -268,6 +269,7 @@ def update_agent_status(agent_id: str, body: AgentStatusUpdate, db: Session = De
             user.is_active = body.is_active
             db.commit()
             db.refresh(user)
+            principal_cache.invalidate(user.id)
 
     return {
         "success": True,
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from uuid import UUID
+
+from app.db.session import get_db
+from app.models.inventory import InventoryItem
+from app.models.stock_hold import StockHold
+from app.models.user import User
+from app.schemas.stock_hold import StockHoldCreate, StockHoldResponse
+from app.services.hold_sweeper import hold_sweeper
+from app.services.stock_service import reserve_stock, release_hold
+from app.utils.auth import get_current_user
+
+router = APIRouter()
+
+
+# ==========================================
+# 1. HOLD STOCK FOR A CART LINE (Customer)
+# ==========================================
+@router.post("/holds", response_model=StockHoldResponse, status_code=201)
+def create_hold(
+    body: StockHoldCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Reserve stock while the customer is still shopping.
+    The units leave the shelf now and come back automatically after
+    CART_HOLD_TTL_MINUTES unless the hold is used at checkout.
+    """
+    if current_user.role != "customer":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only customers can hold stock.",
+        )
+
+    inventory_item = db.query(InventoryItem).filter(
+        InventoryItem.shop_id == body.shop_id,
+        InventoryItem.product_id == body.product_id,
+    ).first()
+    if not inventory_item:
+        raise HTTPException(status_code=400, detail=f"Product ID {body.product_id} is not sold here.")
+
+    hold = reserve_stock(db, inventory_item, current_user.id, body.quantity)
+    if hold is None:
+        raise HTTPException(status_code=400, detail=f"Not enough stock for Product ID {body.product_id}.")
+
+    db.commit()
+    db.refresh(hold)
+
+    # Let the in-memory sweeper know when this one lapses
+    hold_sweeper.schedule(str(hold.id), hold.expires_at)
+
+    return hold
+
+
+# ==========================================
+# 2. LIST MY ACTIVE HOLDS (Customer)
+# ==========================================
+@router.get("/holds", response_model=List[StockHoldResponse])
+def list_my_holds(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    holds = (
+        db.query(StockHold)
+        .filter(StockHold.customer_id == current_user.id)
+        .order_by(StockHold.expires_at)
+        .all()
+    )
+    return holds
+
+
+# ==========================================
+# 3. RELEASE A HOLD EARLY (Customer removed it from cart)
+# ==========================================
+@router.delete("/holds/{hold_id}")
+def delete_hold(
+    hold_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not release_hold(db, hold_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Cart hold not found or already released.")
+
+    db.commit()
+    return {"success": True, "message": "Cart hold released."}
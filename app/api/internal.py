@@ -7,7 +7,10 @@ from app.models.order import Order
 from app.models.shop import Shop
 from app.models.user import User
 from app.core.config import settings
-from app.services.notification_service import send_notification
+from app.core.ws_manager import manager
+from app.services.notification_service import send_notifications_bulk
+from app.services.stock_service import release_expired_holds
+from app.services.notification_retention import apply_notification_retention
 
 router = APIRouter()
 
@@ -50,20 +53,20 @@ async def check_order_timeouts(
         # We don't change the status (merchant could still technically accept it late),
         # we just alert the admin so they can call the shop contextually.
         
-        for admin in admins:
-            await send_notification(
-                user_id=str(admin.id),
-                title="🚨 Overdue Order Alert!",
-                body=f"Order {order.id} at {shop_name} has been pending for over 15 minutes!",
-                notification_type="order_timeout",
-                data={
-                    "order_id": str(order.id),
-                    "shop_id": str(order.shop_id),
-                    "shop_name": shop_name,
-                    "created_at": str(order.created_at)
-                },
-                db=db
-            )
+        # One INSERT + one commit for all admins instead of one transaction each
+        await send_notifications_bulk(
+            recipients=[admin.id for admin in admins],
+            title="🚨 Overdue Order Alert!",
+            body=f"Order {order.id} at {shop_name} has been pending for over 15 minutes!",
+            notification_type="order_timeout",
+            data={
+                "order_id": str(order.id),
+                "shop_id": str(order.shop_id),
+                "shop_name": shop_name,
+                "created_at": str(order.created_at)
+            },
+            db=db
+        )
         processed_count += 1
         
     return {
@@ -71,3 +74,69 @@ async def check_order_timeouts(
         "message": f"Processed {processed_count} overdue orders",
         "count": processed_count
     }
+
+
+@router.post("/cron/release-expired-holds")
+def release_expired_cart_holds(
+    x_cron_secret: str = Header(..., description="Secret key to authorize cron execution"),
+    db: Session = Depends(get_db)
+):
+    """
+    Backstop for the in-process hold sweeper (e.g. if no API worker is running).
+    Gives the stock of every lapsed cart hold back to its inventory item.
+    """
+    if x_cron_secret != settings.CRON_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Unauthorized cron request"
+        )
+
+    released = release_expired_holds(db)
+
+    return {
+        "success": True,
+        "message": f"Released {released} expired cart hold(s)",
+        "count": released
+    }
+
+
+@router.post("/cron/notification-retention")
+def run_notification_retention(
+    x_cron_secret: str = Header(..., description="Secret key to authorize cron execution"),
+    db: Session = Depends(get_db)
+):
+    """
+    Called daily by the external cron service.
+    Archives (or deletes) READ notifications older than NOTIFICATION_RETENTION_DAYS
+    in batches, keeping the hot notifications table — and every inbox query — small.
+    """
+    if x_cron_secret != settings.CRON_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Unauthorized cron request"
+        )
+
+    removed = apply_notification_retention(db)
+
+    return {
+        "success": True,
+        "message": f"{settings.NOTIFICATION_RETENTION_MODE.title()}d {removed} old notification(s)",
+        "count": removed
+    }
+
+
+@router.get("/ws-metrics")
+async def get_ws_metrics(
+    x_cron_secret: str = Header(..., description="Secret key to authorize internal calls"),
+):
+    """
+    This worker's WebSocket send stats: open connections, outbound queue depth,
+    messages sent, slow consumers evicted and enqueue → send latency percentiles.
+    """
+    if x_cron_secret != settings.CRON_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Unauthorized cron request"
+        )
+
+    return {"success": True, "worker_id": manager.worker_id, **manager.metrics.snapshot(manager.all_connections())}
@@ -1,6 +1,8 @@
 from app.utils.auth import get_current_user
 from app.schemas.inventory import InventoryUpdate
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
@@ -11,6 +13,9 @@ from app.models.shop import Shop
 from app.models.product import Product
 from app.models.user import User
 from app.schemas.inventory import InventoryCreate, InventoryResponse, ShopItemResponse
+from app.services.export_service import EXPORT_MEDIA_TYPES, stream_export
+from app.services.live_updates import queue_inventory_update
+from app.services.low_stock import note_stock_change
 
 router = APIRouter()
 
@@ -86,12 +91,63 @@ def get_merchant_inventory(skip: int = 0, limit: int = 100, db: Session = Depend
             "mrp": prod.mrp,
             "unit": getattr(prod, 'unit', None), # fallback
             "price": inv.price,
-            "stock": inv.stock
+            "stock": inv.stock,
+            "reorder_level": inv.reorder_level
         })
         
     return response_items
 
 
+# ==========================================
+# EXPORT MERCHANT'S FULL INVENTORY (Protected, Streaming)
+# ==========================================
+@router.get("/merchant/export")
+def export_merchant_inventory(
+    export_format: str = Query("csv", alias="format", description="Export format: csv or ndjson"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streams the whole inventory in one response (for accountants / spreadsheets).
+    Memory stays flat regardless of shop size: rows come off a server-side cursor
+    and are written out batch by batch.
+    """
+    # 1. Role-Based Check
+    if current_user.role != "merchant":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Merchant access required.")
+
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid format '{export_format}'. Must be one of: {set(EXPORT_MEDIA_TYPES)}")
+
+    # 2. Derive shop from token
+    shop = db.query(Shop).filter(Shop.owner_id == current_user.id).first()
+    if not shop:
+        raise HTTPException(status_code=404, detail="No shop found for this merchant account.")
+
+    # 3. Plain column projection — no ORM objects are built per row
+    columns = ["inventory_id", "product_id", "product_name", "barcode", "unit", "mrp", "price", "stock", "reorder_level"]
+    stmt = (
+        select(
+            InventoryItem.id,
+            Product.id,
+            Product.name,
+            Product.barcode,
+            Product.unit,
+            Product.mrp,
+            InventoryItem.price,
+            InventoryItem.stock,
+            InventoryItem.reorder_level,
+        )
+        .join(Product, InventoryItem.product_id == Product.id)
+        .where(InventoryItem.shop_id == shop.id)
+        .order_by(Product.name)
+    )
+
+    return StreamingResponse(
+        stream_export(stmt, columns, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="inventory_{shop.id}.{export_format}"'},
+    )
 
 
 # ==========================================
@@ -118,10 +174,19 @@ def update_inventory_item(
         )
 
     # 3. Apply updates dynamically
+    old_stock, old_reorder_level = item.stock, item.reorder_level
     update_dict = update_data.model_dump(exclude_unset=True)
     for key, value in update_dict.items():
         setattr(item, key, value)
 
+    # 4. Queue a low-stock alert if this update just crossed the reorder level
+    note_stock_change(
+        db, item.id, item.shop_id, item.product_id,
+        old_stock, item.stock, old_reorder_level, item.reorder_level,
+    )
+    # Live stock for anyone watching shop:<id>:inventory (sent after the commit)
+    queue_inventory_update(db, item.shop_id, item.id, item.product_id, item.stock)
+
     db.commit()
     db.refresh(item)
     return item
\ No newline at end of file
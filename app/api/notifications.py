@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from uuid import UUID
+import base64
 
+from app.core.ws_manager import manager
 from app.db.session import get_db
 from app.models.notification import Notification
 from app.models.user import User
-from app.schemas.notification import NotificationResponse, UnreadCountResponse
+from app.schemas.notification import NotificationResponse, NotificationPage, UnreadCountResponse
+from app.services.unread_counter import unread_counter
 from app.utils.auth import get_current_user
 
 router = APIRouter()
@@ -37,6 +42,78 @@ def list_notifications(
     return notifications
 
 
+# ==========================================
+# HELPER: Opaque keyset cursor = base64("<created_at iso>|<id>")
+# ==========================================
+def _encode_cursor(created_at: datetime, notification_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{notification_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(notification_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+# ==========================================
+# 1b. INBOX WITH CURSOR PAGINATION (Authenticated)
+# ==========================================
+@router.get("/inbox", response_model=NotificationPage)
+def list_inbox(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    unread_only: bool = Query(False, description="Show only unread notifications"),
+    include_data: bool = Query(False, description="Include the JSON data blob on each row"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Keyset-paginated inbox: each page continues strictly after the last row of
+    the previous one, so page 500 costs the same as page 1 (no OFFSET scan).
+    Served by the (user_id, is_read, created_at DESC, id DESC) index.
+    """
+    # Plain columns — skip the JSON blob unless the client needs it
+    columns = [
+        Notification.id,
+        Notification.title,
+        Notification.body,
+        Notification.type,
+        Notification.is_read,
+        Notification.created_at,
+    ]
+    if include_data:
+        columns.append(Notification.data)
+
+    query = db.query(*columns).filter(Notification.user_id == current_user.id)
+
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.filter(
+            tuple_(Notification.created_at, Notification.id) < tuple_(cursor_created_at, cursor_id)
+        )
+
+    # Fetch one extra row to know whether there is another page
+    rows = (
+        query.order_by(Notification.created_at.desc(), Notification.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(last.created_at, last.id)
+
+    return {"data": rows, "next_cursor": next_cursor}
+
+
 # ==========================================
 # 2. GET UNREAD COUNT (Authenticated)
 # ==========================================
@@ -45,15 +122,9 @@ def get_unread_count(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    count = (
-        db.query(Notification)
-        .filter(
-            Notification.user_id == current_user.id,
-            Notification.is_read == False,
-        )
-        .count()
-    )
-    return {"unread_count": count}
+    # Maintained counter (memory → notification_counters row), no count(*) over the inbox.
+    # Connected clients also get {"type": "unread_count"} pushed over the WebSocket.
+    return {"unread_count": unread_counter.get(db, current_user.id)}
 
 
 # ==========================================
@@ -65,6 +136,19 @@ def mark_as_read(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    # Only an unread → read flip moves the counter, so repeating this is harmless
+    flipped = (
+        db.query(Notification)
+        .filter(
+            Notification.id == notification_id,
+            Notification.user_id == current_user.id,
+            Notification.is_read == False,
+        )
+        .update({"is_read": True}, synchronize_session=False)
+    )
+    counts = unread_counter.decrement(db, current_user.id, flipped)
+    db.commit()
+
     notification = (
         db.query(Notification)
         .filter(
@@ -79,9 +163,10 @@ def mark_as_read(
             detail="Notification not found.",
         )
 
-    notification.is_read = True
-    db.commit()
-    db.refresh(notification)
+    if counts:
+        unread_counter.remember(counts)
+        # Sync endpoint (threadpool) — the push runs on the event loop, not awaited here
+        manager.run_threadsafe(unread_counter.push(counts))
     return notification
 
 
@@ -101,8 +186,13 @@ def mark_all_as_read(
         )
         .update({"is_read": True})
     )
+    counts = unread_counter.decrement(db, current_user.id, updated)
     db.commit()
 
+    if counts:
+        unread_counter.remember(counts)
+        manager.run_threadsafe(unread_counter.push(counts))
+
     return {
         "success": True,
         "message": f"{updated} notification(s) marked as read.",
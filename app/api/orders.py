@@ -1,4 +1,6 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timezone
@@ -9,11 +11,17 @@ from app.models.order import Order, OrderItem
 from app.models.inventory import InventoryItem
 from app.models.shop import Shop
 from app.models.cart_suggestion import CartSuggestion
+from app.models.product import Product
 from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate, PaginatedOrderResponse
 from app.schemas.cart_suggestion import CartSuggestionResponse
 from app.utils.auth import get_current_user
 from app.models.user import User
 from app.services.notification_service import send_notification
+from app.services.notification_coalescer import notification_coalescer
+from app.services.live_updates import publish_order_event
+from app.services.stock_service import consume_hold, restore_order_stock, take_stock
+from app.services.export_service import EXPORT_MEDIA_TYPES, stream_export
+from app.services.ocr_worker import enqueue_ocr_job, ocr_worker
 
 
 router = APIRouter()
@@ -28,7 +36,6 @@ VALID_STATUSES = {"pending", "confirmed", "preparing", "ready", "picked_up", "de
 @router.post("/", response_model=OrderResponse)
 async def create_order(
     order_data: OrderCreate, 
-    background_tasks: BackgroundTasks,              # <--- For OCR processing
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)  # <--- THE SECURITY BOUNCER
 ):
@@ -70,7 +77,26 @@ async def create_order(
     # 4. Process items ONLY IF the user actually selected digital items
     if order_data.items:
         for item in order_data.items:
-            if item.product_id:
+            quantity = item.quantity
+            if item.hold_id and not item.product_id:
+                raise HTTPException(status_code=400, detail=f"Cart hold {item.hold_id} needs the product_id it was created for.")
+
+            if item.hold_id:
+                # The stock was already taken off the shelf when the cart hold was created,
+                # so we just consume the hold instead of re-checking stock.
+                held = consume_hold(db, item.hold_id, current_user.id, order_data.shop_id, item.product_id)
+                if held is None:
+                    raise HTTPException(status_code=400, detail=f"Cart hold {item.hold_id} has expired or is not valid.")
+                if held.quantity != item.quantity:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Cart hold {item.hold_id} is for {held.quantity} unit(s), not {item.quantity}.",
+                    )
+
+                inventory_item = db.query(InventoryItem).filter(InventoryItem.id == held.inventory_item_id).first()
+                item_price = inventory_item.price
+                total_amount += (item_price * quantity)
+            elif item.product_id:
                 inventory_item = db.query(InventoryItem).filter(
                     InventoryItem.shop_id == order_data.shop_id,
                     InventoryItem.product_id == item.product_id
@@ -79,10 +105,10 @@ async def create_order(
                 if not inventory_item:
                     raise HTTPException(status_code=400, detail=f"Product ID {item.product_id} is not sold here.")
                 
-                if inventory_item.stock < item.quantity:
+                # Atomic check-and-decrement (also queues a low-stock alert if it crosses the reorder level)
+                if take_stock(db, inventory_item.id, item.quantity) is None:
                     raise HTTPException(status_code=400, detail=f"Not enough stock for Product ID {item.product_id}.")
 
-                inventory_item.stock -= item.quantity
                 item_price = inventory_item.price
                 total_amount += (item_price * item.quantity)
             else:
@@ -90,7 +116,7 @@ async def create_order(
 
             order_items_to_create.append({
                 "product_id": item.product_id,
-                "quantity": item.quantity,
+                "quantity": quantity,
                 "price_at_time_of_order": item_price,
                 "special_instructions": item.special_instructions
             })
@@ -120,15 +146,19 @@ async def create_order(
         )
         db.add(new_order_item)
 
+    # 7. 📸 If a chitty image was uploaded, queue OCR in the SAME transaction (survives restarts)
+    if order_data.list_image_urls:
+        enqueue_ocr_job(db, new_order.id)
+
     db.commit()
     db.refresh(new_order)
-
-    # 7. 📸 If a chitty image was uploaded, trigger OCR in the background!
     if order_data.list_image_urls:
-        from app.services.ocr import process_chitty_order
-        background_tasks.add_task(process_chitty_order, new_order.id)
+        ocr_worker.notify()
+
+    # 8. 📡 Live shop dashboards subscribed to shop:<id>
+    await publish_order_event(new_order, "new_order")
 
-    # 8. 🔔 Push notification to the MERCHANT (persisted + WebSocket)
+    # 9. 🔔 Push notification to the MERCHANT (persisted + WebSocket)
     await send_notification(
         user_id=str(shop.owner_id),
         title="🛒 New Order Received!",
@@ -199,6 +229,78 @@ def get_merchant_orders(
         "current_page": current_page
     }
 
+# ==========================================
+# EXPORT MERCHANT'S ORDER HISTORY (Protected, Streaming)
+# ==========================================
+@router.get("/merchant/export")
+def export_merchant_orders(
+    export_format: str = Query("csv", alias="format", description="Export format: csv or ndjson"),
+    order_status: Optional[str] = Query(None, alias="status", description="Filter by status: pending, confirmed, etc."),
+    created_from: Optional[datetime] = Query(None, description="Only orders created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only orders created before this time"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)  # <--- Require Token
+):
+    """
+    Streams the shop's order history, one row per order line, as CSV or NDJSON.
+    Rows come off a server-side cursor so memory stays flat however many orders there are.
+    """
+    # 1. Role-Based Check
+    if current_user.role != "merchant":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Not authorized. Merchant access required."
+        )
+
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid format '{export_format}'. Must be one of: {set(EXPORT_MEDIA_TYPES)}")
+
+    # 2. Derive the shop from the merchant's user ID
+    shop = db.query(Shop).filter(Shop.owner_id == current_user.id).first()
+    if not shop:
+        raise HTTPException(status_code=404, detail="No shop found for this merchant account.")
+
+    # 3. Plain column projection over orders ⟕ order_items ⟕ products
+    columns = [
+        "order_id", "created_at", "status", "order_type", "scheduled_pickup_time", "customer_id",
+        "order_total", "product_id", "product_name", "quantity", "price_at_time_of_order", "special_instructions",
+    ]
+    stmt = (
+        select(
+            Order.id,
+            Order.created_at,
+            Order.status,
+            Order.order_type,
+            Order.scheduled_pickup_time,
+            Order.customer_id,
+            Order.total_amount,
+            OrderItem.product_id,
+            Product.name,
+            OrderItem.quantity,
+            OrderItem.price_at_time_of_order,
+            OrderItem.special_instructions,
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, OrderItem.product_id == Product.id)
+        .where(Order.shop_id == shop.id)
+        .order_by(Order.created_at.desc(), Order.id)
+    )
+
+    if order_status:
+        if order_status not in VALID_STATUSES:
+            raise HTTPException(status_code=400, detail=f"Invalid status filter. Must be one of: {VALID_STATUSES}")
+        stmt = stmt.where(Order.status == order_status)
+    if created_from:
+        stmt = stmt.where(Order.created_at >= created_from)
+    if created_to:
+        stmt = stmt.where(Order.created_at < created_to)
+
+    return StreamingResponse(
+        stream_export(stmt, columns, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="orders_{shop.id}.{export_format}"'},
+    )
+
 # ==========================================
 # UPDATE ORDER STATUS & FINAL AMOUNT (Protected + WebSocket Push)
 # ==========================================
@@ -216,8 +318,8 @@ async def update_order(
             detail="Not authorized. Merchant access required."
         )
 
-    # 2. Find the order
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # 2. Find the order (row-locked, so two cancellations can't both restock)
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -232,6 +334,10 @@ async def update_order(
         # --- Strict State Machine Enforcement ---
         current_status = order.status
         new_status = update_data.status
+
+        # A replayed cancellation is a no-op: the stock was already given back
+        if current_status == "cancelled" and new_status == "cancelled":
+            return order
         
         # Define allowed next states map
         ALLOWED_TRANSITIONS = {
@@ -251,6 +357,10 @@ async def update_order(
             )
             
         order.status = new_status
+
+        # Give the stock back in the same transaction as the status change
+        if new_status == "cancelled":
+            restore_order_stock(db, order)
         
     if update_data.total_amount is not None:
         order.total_amount = update_data.total_amount
@@ -262,10 +372,15 @@ async def update_order(
     db.commit()
     db.refresh(order)
     
-    # 5. 🔔 Push notification to the CUSTOMER (persisted + WebSocket)
+    # 5. 📡 Live views subscribed to order:<id> / shop:<id> see every change, uncoalesced
+    await publish_order_event(order, "order_status")
+
+    # 6. 🔔 Push notification to the CUSTOMER (persisted + WebSocket)
+    # Quick successive status changes on one order are merged into one delivered notification
     if update_data.status == "ready":
-        await send_notification(
+        await notification_coalescer.submit(
             user_id=str(order.customer_id),
+            key=f"order:{order.id}",
             title="✅ Order Ready for Pickup!",
             body=f"Your order is ready! Head to the shop to pick it up.",
             notification_type="pickup_ready",
@@ -285,8 +400,9 @@ async def update_order(
             "delivered": "Your order has been delivered. Enjoy!",
             "cancelled": "Your order has been cancelled.",
         }
-        await send_notification(
+        await notification_coalescer.submit(
             user_id=str(order.customer_id),
+            key=f"order:{order.id}",
             title=f"📦 Order {update_data.status.replace('_', ' ').title()}",
             body=status_messages.get(update_data.status, f"Order status updated to: {update_data.status}"),
             notification_type="order_update",
@@ -6,6 +6,7 @@ from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import UserStatusUpdate, FCMTokenUpdate
 from app.utils.auth import get_current_user
+from app.utils.ws_auth import principal_cache
 
 router = APIRouter()
 
@@ -21,6 +22,8 @@ def update_user_status(user_id: UUID, body: UserStatusUpdate, db: Session = Depe
     user.is_active = body.is_active
     db.commit()
     db.refresh(user)
+    # WebSocket handshakes must not keep trusting the cached status
+    principal_cache.invalidate(user.id)
     
     return {
         "success": True,
@@ -1,5 +1,8 @@
+import asyncio
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.core.ws_manager import manager
+from app.core.ws_manager import MSGPACK_SUBPROTOCOL, Connection, Frame, manager, msgpack
+from app.services.live_updates import can_subscribe, parse_topic
+from app.utils.ws_auth import authenticate_websocket
 
 router = APIRouter()
 
@@ -9,31 +12,85 @@ router = APIRouter()
 # Customers connect here to receive real-time order updates.
 #
 # Frontend usage (React Native / JavaScript):
-#   const ws = new WebSocket("ws://localhost:8000/api/v1/ws/orders/customer/<user-uuid>");
+#   const ws = new WebSocket("ws://localhost:8000/ws/orders/customer/<user-uuid>?token=<access-token>");
 #   ws.onmessage = (event) => {
 #       const data = JSON.parse(event.data);
 #       console.log("Order update:", data);
 #   };
+#
+# Live views can also follow just one order / shop over the same socket:
+#   ws.send(JSON.stringify({ type: "subscribe", topic: "order:<order-uuid>" }));
 # ==========================================
 
+async def handle_subscription(connection: Connection, user_id: str, message: dict):
+    """
+    {"type": "subscribe", "topic": "order:<id>"}   → {"type": "subscribed", "topic": ...}
+    {"type": "unsubscribe", "topic": "order:<id>"} → {"type": "unsubscribed", "topic": ...}
+    Refusals come back as {"type": "error", "code": ..., "topic": ...}.
+    """
+    message_type, topic = message.get("type"), message.get("topic")
+    if message_type not in ("subscribe", "unsubscribe"):
+        return
+
+    def reply(payload: dict):
+        connection.enqueue(Frame({**payload, "topic": topic}))
+
+    if parse_topic(topic) is None:
+        reply({"type": "error", "code": "INVALID_TOPIC"})
+    elif message_type == "unsubscribe":
+        manager.unsubscribe(connection, topic)
+        reply({"type": "unsubscribed"})
+    elif not await asyncio.to_thread(can_subscribe, user_id, topic):
+        reply({"type": "error", "code": "FORBIDDEN"})
+    elif not manager.subscribe(connection, topic):
+        reply({"type": "error", "code": "TOO_MANY_TOPICS"})
+    else:
+        reply({"type": "subscribed"})
+
+
 async def handle_websocket(websocket: WebSocket, user_id: str):
-    # 1. Register this connection under the user's ID
-    await manager.connect(websocket, user_id)
+    # 1. Pick the wire format: MessagePack if the client asked for it (and we have it), else JSON
+    subprotocol = None
+    if msgpack is not None and MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        subprotocol = MSGPACK_SUBPROTOCOL
+
+    # 2. A reconnecting client passes ?last_event_id=<id> to get the events it missed
+    last_event_id = None
+    try:
+        last_event_id = int(websocket.query_params["last_event_id"])
+    except (KeyError, ValueError):
+        pass
+
+    # 3. Register this connection under the user's ID (queues the replay first)
+    connection = await manager.connect(websocket, user_id, subprotocol=subprotocol, last_event_id=last_event_id)
     try:
-        # Keep connection alive
+        # 4. Every client frame (pong, ping...) keeps the connection alive;
+        #    the manager's reaper closes sockets that go quiet. Text and binary
+        #    frames are both accepted whatever the subprotocol
         while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            data = frame["bytes"] if frame.get("bytes") is not None else frame.get("text")
+            message = manager.handle_client_message(connection, data)
+            if message is not None:
+                await handle_subscription(connection, user_id, message)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the server already closed the socket (evicted / reaped)
+        pass
+    finally:
         manager.disconnect(websocket, user_id)
 
 
 @router.websocket("/orders/customer/{user_id}")
 async def websocket_customer_order_updates(websocket: WebSocket, user_id: str):
     """Endpoint for customers to receive order updates."""
-    await handle_websocket(websocket, user_id)
+    if await authenticate_websocket(websocket, user_id):
+        await handle_websocket(websocket, user_id)
 
 
 @router.websocket("/orders/merchant/{user_id}")
 async def websocket_merchant_order_updates(websocket: WebSocket, user_id: str):
     """Endpoint for merchants to receive new orders."""
-    await handle_websocket(websocket, user_id)
+    if await authenticate_websocket(websocket, user_id):
+        await handle_websocket(websocket, user_id)
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+# Called with every payload published on the channel (by any worker, including this one)
+MessageHandler = Callable[[str], None]
+
+
+# ==========================================
+# BROKER BACKENDS (WebSocket fan-out between uvicorn workers)
+# ==========================================
+class Broker(ABC):
+    """
+    A pub/sub channel shared by every worker. `ConnectionManager` publishes
+    "deliver this to user X" and presence updates here; each worker delivers
+    to the sockets it holds locally.
+    """
+
+    # False for brokers that can't reach other processes (nothing to publish for)
+    distributed = False
+
+    @abstractmethod
+    async def start(self, on_message: MessageHandler):
+        """Subscribe: `on_message` is called on the event loop with every payload."""
+
+    @abstractmethod
+    async def stop(self):
+        """Unsubscribe and release connections."""
+
+    @abstractmethod
+    async def publish(self, payload: str):
+        """Send `payload` to every subscribed worker."""
+
+
+class InMemoryBroker(Broker):
+    """
+    Single-process broker (the default, and for tests). Several managers can
+    share one instance (with distributed=True) to simulate several workers in
+    one process.
+    """
+
+    def __init__(self, distributed: bool = False):
+        self.distributed = distributed
+        self._subscribers: List[MessageHandler] = []
+
+    async def start(self, on_message: MessageHandler):
+        self._subscribers.append(on_message)
+
+    async def stop(self):
+        self._subscribers.clear()
+
+    async def publish(self, payload: str):
+        for on_message in list(self._subscribers):
+            on_message(payload)
+
+
+class PostgresBroker(Broker):
+    """
+    Fan-out over Postgres LISTEN/NOTIFY — no extra infrastructure.
+
+    - One dedicated autocommit connection LISTENs; its socket is watched with
+      `loop.add_reader`, so notifications are read on the event loop without a
+      polling thread.
+    - Publishing uses a second connection from a worker thread (psycopg2 is
+      blocking), serialized by a lock.
+    - NOTIFY payloads are capped at 8000 bytes: bigger messages are split into
+      chunks sent in ONE transaction (delivered together, in order) and
+      reassembled by the listeners.
+    - If the listen connection drops, it reconnects with backoff. Messages
+      published while it was down are lost — clients recover them through
+      `/notifications` like any other missed push.
+    """
+
+    distributed = True
+
+    # Leave headroom under Postgres' 8000-byte limit for the chunk envelope
+    CHUNK_BYTES = 7000
+
+    def __init__(self, channel: str = "kmart_ws"):
+        self.channel = channel
+        self._on_message: Optional[MessageHandler] = None
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        # { chunked message id: (parts, first_seen_monotonic) }
+        self._partial: Dict[str, tuple] = {}
+        self._stopping = False
+
+    @staticmethod
+    def _connect():
+        """A raw psycopg2 connection using the app engine's settings, outside its pool."""
+        import psycopg2.extensions
+        from app.db.session import engine
+
+        pooled = engine.raw_connection()
+        pooled.detach()
+        conn = pooled.driver_connection
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    async def start(self, on_message: MessageHandler):
+        self._on_message = on_message
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        await self._listen()
+        print(f"📡 WebSocket broker listening on Postgres channel '{self.channel}'")
+
+    async def _listen(self):
+        conn = await asyncio.to_thread(self._connect)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{self.channel}"')
+        self._listen_conn = conn
+        self._loop.add_reader(conn.fileno(), self._on_readable)
+
+    async def stop(self):
+        self._stopping = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        self._close_listen_conn()
+        if self._publish_conn is not None:
+            self._publish_conn.close()
+            self._publish_conn = None
+
+    def _close_listen_conn(self):
+        if self._listen_conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._listen_conn.fileno())
+            self._listen_conn.close()
+        except Exception:
+            pass
+        self._listen_conn = None
+
+    def _on_readable(self):
+        try:
+            self._listen_conn.poll()
+        except Exception as e:
+            print(f"⚠️ WebSocket broker lost its Postgres connection: {e}")
+            self._close_listen_conn()
+            if not self._stopping:
+                self._reconnect_task = self._loop.create_task(self._reconnect())
+            return
+
+        notifies = self._listen_conn.notifies
+        while notifies:
+            payload = self._reassemble(notifies.pop(0).payload)
+            if payload is not None:
+                try:
+                    self._on_message(payload)
+                except Exception as e:
+                    print(f"❌ WebSocket broker handler error: {e}")
+
+    async def _reconnect(self):
+        delay = 0.5
+        while not self._stopping:
+            await asyncio.sleep(delay)
+            try:
+                await self._listen()
+                print("📡 WebSocket broker reconnected")
+                return
+            except Exception as e:
+                print(f"⚠️ WebSocket broker reconnect failed: {e}")
+                delay = min(delay * 2, 30)
+
+    # ------------------------------------------
+    # Publishing (chunked above the NOTIFY size limit)
+    # ------------------------------------------
+    async def publish(self, payload: str):
+        await asyncio.to_thread(self._publish_sync, self._chunk(payload))
+
+    def _chunk(self, payload: str) -> List[str]:
+        encoded = payload.encode()
+        if len(encoded) <= self.CHUNK_BYTES:
+            return [payload]
+
+        # Split on characters, measured as JSON-escaped bytes, so multi-byte text never
+        # breaks mid-character and escaping can't push a chunk over the limit
+        parts, current, size = [], [], 0
+        for ch in payload:
+            ch_size = len(json.dumps(ch, ensure_ascii=False).encode()) - 2
+            if size + ch_size > self.CHUNK_BYTES:
+                parts.append("".join(current))
+                current, size = [], 0
+            current.append(ch)
+            size += ch_size
+        parts.append("".join(current))
+
+        message_id = uuid.uuid4().hex
+        # Envelopes are JSON objects; a chunk is a JSON array [id, index, total, part]
+        return [json.dumps([message_id, i, len(parts), part], ensure_ascii=False) for i, part in enumerate(parts)]
+
+    def _publish_sync(self, payloads: List[str]):
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publish_conn is None or self._publish_conn.closed:
+                        self._publish_conn = self._connect()
+                    with self._publish_conn.cursor() as cur:
+                        # One transaction → all chunks are delivered together, in order
+                        cur.execute("BEGIN")
+                        for payload in payloads:
+                            cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                        cur.execute("COMMIT")
+                    return
+                except Exception as e:
+                    self._publish_conn = None
+                    if attempt:
+                        print(f"❌ WebSocket broker publish failed: {e}")
+
+    def _reassemble(self, payload: str) -> Optional[str]:
+        if not payload.startswith("["):
+            return payload
+
+        message_id, index, total, part = json.loads(payload)
+        parts, first_seen = self._partial.get(message_id, ({}, time.monotonic()))
+        parts[index] = part
+        if len(parts) < total:
+            self._partial[message_id] = (parts, first_seen)
+            self._expire_partials()
+            return None
+
+        self._partial.pop(message_id, None)
+        return "".join(parts[i] for i in range(total))
+
+    def _expire_partials(self):
+        """Drop half-received messages (a listener reconnect can lose chunks)."""
+        cutoff = time.monotonic() - 30
+        for message_id in [m for m, (_, seen) in self._partial.items() if seen < cutoff]:
+            del self._partial[message_id]
+
+
+def create_broker() -> Broker:
+    """Pick the backend from WS_BROKER ("memory" or "postgres")."""
+    if settings.WS_BROKER == "postgres":
+        return PostgresBroker()
+    return InMemoryBroker()
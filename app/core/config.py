@@ -16,6 +16,81 @@ class Settings(BaseSettings):
     # --- CRON SECRETS ---
     CRON_SECRET: str = "test-cron-secret-change-in-production"
 
+    # --- CART STOCK HOLDS ---
+    CART_HOLD_TTL_MINUTES: int = 10                 # How long a cart line keeps its stock reserved
+    CART_HOLD_SWEEP_BATCH: int = 500                # Holds released per UPDATE by the sweeper
+    CART_HOLD_SWEEP_MAX_SLEEP_SECONDS: int = 30     # Backstop sweep interval (holds from other workers)
+
+    # --- LOW-STOCK ALERTS ---
+    LOW_STOCK_DIGEST_WINDOW_SECONDS: int = 60  # Crossings within this window become one notification per shop
+
+    # --- NOTIFICATIONS ---
+    UNREAD_COUNT_CACHE_SECONDS: int = 30  # How long a worker trusts its in-memory unread count
+    NOTIFICATION_RETENTION_DAYS: int = 90       # Read notifications older than this leave the hot table
+    NOTIFICATION_RETENTION_MODE: str = "archive"  # "archive" (move to notifications_archive) or "delete"
+    NOTIFICATION_RETENTION_BATCH: int = 5000    # Rows moved per statement by the retention job
+    NOTIFICATION_COALESCE_WINDOW_MS: int = 3000  # Order status updates within this window → one delivered notification (0 = off)
+    NOTIFICATION_COALESCE_PERSIST: str = "all"  # "all" (keep every status row) or "delivered" (store only the merged one)
+
+    # --- WEBSOCKETS ---
+    WS_BROKER: str = "memory"               # "memory" (single worker) or "postgres" (LISTEN/NOTIFY across workers)
+    WS_PRESENCE_HEARTBEAT_SECONDS: int = 10  # Workers re-announce who is connected to them this often
+    WS_SEND_QUEUE_SIZE: int = 256           # Messages buffered per socket before it is evicted as a slow consumer
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0   # A single send stalled this long evicts the socket
+    WS_PING_INTERVAL_SECONDS: int = 25      # Quiet sockets get {"type": "ping"} this often
+    WS_PONG_TIMEOUT_SECONDS: int = 10       # Ping-answering clients are closed if the pong is this late
+    WS_IDLE_TIMEOUT_SECONDS: int = 300      # Any socket silent this long is closed
+    WS_REAPER_INTERVAL_SECONDS: int = 5     # How often the heartbeat / reaper pass runs
+    WS_MAX_TOPICS_PER_CONNECTION: int = 50  # Subscriptions one socket may hold
+    WS_REPLAY_BUFFER_SIZE: int = 100        # Recent events kept per user for reconnects with last_event_id
+    WS_REPLAY_MAX_USERS: int = 10000        # Users with a replay buffer (least recently active dropped first)
+    WS_AUTH_CACHE_SECONDS: int = 30         # Verified handshake principals are reused this long (no DB hit)
+    WS_AUTH_CACHE_SIZE: int = 50000         # Max cached principals per worker
+    WS_ADMISSION_RATE: float = 100.0        # Handshakes admitted per second per worker (token bucket refill)
+    WS_ADMISSION_BURST: int = 200           # Handshakes admitted at once before the rate applies
+
+    # --- PUSH NOTIFICATIONS (FCM HTTP v1) ---
+    FCM_ENABLED: bool = False                   # Off → offline pushes are only logged
+    FCM_ENDPOINT: str = "https://fcm.googleapis.com"  # Point at app/scripts/fake_fcm_server.py for local testing
+    FCM_PROJECT_ID: str = "kmart"
+    FCM_ACCESS_TOKEN: str = ""                  # Static bearer token (fake server / manual testing)
+    FCM_SERVICE_ACCOUNT_FILE: str = ""          # Service-account JSON (needs google-auth) for real FCM
+    FCM_WORKERS: int = 4                        # Concurrent batch senders
+    FCM_BATCH_SIZE: int = 100                   # Max pushes sent together by one worker
+    FCM_BATCH_WINDOW_MS: int = 50               # How long a worker waits to fill a batch
+    FCM_MAX_RETRIES: int = 3                    # Retries on 429 / 5xx / network errors
+    FCM_RETRY_BASE_SECONDS: float = 0.5         # Exponential backoff base (plus jitter)
+    FCM_QUEUE_SIZE: int = 10000                 # Pushes buffered before new ones are dropped
+    FCM_MAX_CONNECTIONS: int = 20               # Pooled keep-alive connections to FCM
+    FCM_TIMEOUT_SECONDS: float = 10.0
+
+    # --- CHITTY OCR ---
+    OCR_WORKER_EMBEDDED: bool = True         # Run the OCR worker inside the API process (False → `python -m app.services.ocr_worker`)
+    OCR_WORKER_CONCURRENCY: int = 2          # Tesseract processes (= jobs in flight) per worker
+    OCR_POLL_INTERVAL_SECONDS: float = 2.0   # Idle workers check for due jobs this often
+    OCR_JOB_MAX_ATTEMPTS: int = 3            # A job failing this many times is marked "failed"
+    OCR_RETRY_BASE_SECONDS: float = 10.0     # Retry backoff: base, 2x, 4x ... (with jitter)
+    OCR_JOB_LEASE_SECONDS: int = 300         # A "running" job not renewed for this long is assumed orphaned and claimed again
+    OCR_SHUTDOWN_GRACE_SECONDS: float = 20.0 # How long shutdown waits for running jobs
+    OCR_NOTIFY_TIMEOUT_SECONDS: float = 10.0 # A job waits this long for its chitty_processed notification to be sent
+    OCR_MATCH_CANDIDATES: int = 40          # Products per OCR line pulled from the trigram index for exact scoring
+    OCR_INDEX_REFRESH_SECONDS: int = 30     # At most this often, re-read products changed by other processes
+    OCR_SHOP_INDEX_CACHE_SIZE: int = 256    # Per-shop match indexes kept in memory (least recently used dropped)
+    OCR_SHOP_INDEX_TTL_SECONDS: int = 120   # A shop's index is rebuilt once this old (other processes' inventory edits)
+    OCR_PREPROCESS: bool = True             # Deskew / binarize / crop photos before Tesseract (False → raw image)
+    OCR_TARGET_DPI: int = 300               # Photos are downscaled to about this resolution...
+    OCR_CHITTY_LONG_SIDE_INCHES: float = 8.3  # ...assuming the chitty's long side is this long (A5)
+    OCR_TESSERACT_LANG: str = "eng"
+    OCR_TESSERACT_OEM: int = 3              # Engine: 1 = LSTM only, 3 = default
+    OCR_TESSERACT_PSM: int = 4              # Page segmentation: 4 = one column of lines (a list), 6 = one block, 3 = auto
+    OCR_CACHE_ENABLED: bool = True          # Reuse OCR lines of an already-seen image (same bytes or near-duplicate)
+    OCR_CACHE_MAX_ENTRIES: int = 50000      # Cached images kept (least recently used evicted)
+    OCR_CACHE_NEAR_DUPLICATE_BITS: int = 0  # dHash bits (of 256) a re-encoded copy may differ by; 0 → exact only (re-encodes 0-3 bits overlap one changed line's 2-6, so off until validated)
+    OCR_CACHE_NEAR_CANDIDATES: int = 50     # A customer's most recently used cache entries compared for near-duplicates
+
+    # --- MERCHANT EXPORTS ---
+    EXPORT_YIELD_PER: int = 1000  # Rows fetched per server-side cursor batch
+
     class Config:
         env_file = ".env"
 
@@ -1,49 +1,581 @@
 from fastapi import WebSocket
-from typing import Dict, List
-import json
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Set, Union
+import asyncio
+import concurrent.futures
+import time
+import uuid
+
+import orjson
+
+from app.core.broker import Broker, create_broker
+from app.core.config import settings
+
+try:
+    import msgpack
+except ImportError:  # Optional — without it the binary subprotocol just isn't offered
+    msgpack = None
+
+# Clients that ask for this subprotocol get MessagePack binary frames instead of JSON text
+MSGPACK_SUBPROTOCOL = "kmart.msgpack.v1"
+
+
+def encode(message: dict) -> str:
+    """JSON-encode a message (orjson; UUIDs / datetimes handled natively)."""
+    return orjson.dumps(message, default=str).decode()
+
+
+class Frame:
+    """
+    One outbound message, encoded at most once per wire format and shared by
+    every socket it goes to (all of a user's devices, every topic subscriber).
+    """
+
+    __slots__ = ("_message", "_text", "_packed")
+
+    def __init__(self, message: Optional[dict] = None, text: Optional[str] = None):
+        self._message = message
+        self._text = text
+        self._packed: Optional[bytes] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = encode(self._message)
+        return self._text
+
+    @property
+    def packed(self) -> bytes:
+        if self._packed is None:
+            message = self._message if self._message is not None else orjson.loads(self._text)
+            self._packed = msgpack.packb(message, default=str)
+        return self._packed
+
+
+# Pre-encoded keep-alive frames (app-level, so they also work through proxies
+# that swallow WebSocket control frames)
+PING_TEXT = '{"type": "ping"}'
+PONG_TEXT = '{"type": "pong"}'
+PING_FRAME = Frame(text=PING_TEXT)
+PONG_FRAME = Frame(text=PONG_TEXT)
+
+
+class WsMetrics:
+    """Counters + a window of recent send latencies, exposed via /internal/ws-metrics."""
+
+    def __init__(self):
+        self.sent = 0
+        self.evicted = 0
+        self.reaped = 0
+        # Handshakes turned away: over the admission rate / bad or missing token
+        self.throttled = 0
+        self.unauthorized = 0
+        # Enqueue → written to the socket, in ms (most recent sends only)
+        self._latencies = deque(maxlen=2048)
+
+    def record_send(self, latency_seconds: float):
+        self.sent += 1
+        self._latencies.append(latency_seconds * 1000)
+
+    def snapshot(self, connections: List["Connection"]) -> dict:
+        latencies = sorted(self._latencies)
+
+        def pct(q):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))], 2) if latencies else 0.0
+
+        depths = [c.queue.qsize() for c in connections]
+        return {
+            "connections": len(connections),
+            "sent": self.sent,
+            "evicted": self.evicted,
+            "reaped": self.reaped,
+            "handshakes_rejected": {"throttled": self.throttled, "unauthorized": self.unauthorized},
+            "queue_depth": {"total": sum(depths), "max": max(depths, default=0)},
+            "send_latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "max": pct(1.0)},
+        }
+
+
+class Connection:
+    """
+    One client socket with its own bounded outbound queue and writer task.
+    Callers only enqueue, so a phone on a bad network can only ever stall its
+    own writer — never the user's other devices or the request that sent it.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str, manager: "ConnectionManager", binary: bool = False):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.manager = manager
+        # True when the client negotiated MSGPACK_SUBPROTOCOL
+        self.binary = binary
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.closed = False
+        # Heartbeat bookkeeping (monotonic seconds) — read by the manager's reaper
+        self.last_seen = time.monotonic()
+        self.last_ping_at = 0.0
+        # Older app builds never answer pings; they only fall under the idle timeout
+        self.answers_pings = False
+        # Topics this socket subscribed to (order:<id>, shop:<id>, ...)
+        self.topics: Set[str] = set()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, frame: Union[Frame, str]):
+        if self.closed:
+            return
+        if isinstance(frame, str):
+            frame = Frame(text=frame)
+        try:
+            self.queue.put_nowait((frame, time.monotonic()))
+        except asyncio.QueueFull:
+            # Slow consumer: it will have to reconnect and catch up from /notifications
+            self.manager.evict(self, "send queue full")
+
+    async def _write_loop(self):
+        try:
+            while True:
+                item = await self.queue.get()
+                if item is None:
+                    return  # stop() — the socket is gone
+                frame, queued_at = item
+                if self.binary:
+                    send = self.websocket.send_bytes(frame.packed)
+                else:
+                    send = self.websocket.send_text(frame.text)
+                await asyncio.wait_for(send, timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+                self.manager.metrics.record_send(time.monotonic() - queued_at)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.manager.evict(self, "send timed out")
+        except Exception:
+            # Socket already gone — just drop it
+            self.manager.disconnect(self.websocket, self.user_id)
+
+    def stop(self):
+        self.closed = True
+        if self._writer is asyncio.current_task():
+            return
+        # Wake the writer with a sentinel; only a writer stuck mid-send (full queue) is cancelled
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self._writer.cancel()
+
+
+class ReplayBuffer:
+    """
+    The last WS_REPLAY_BUFFER_SIZE events of each user, for clients that
+    reconnect with `last_event_id`. Users are kept in LRU order and capped at
+    WS_REPLAY_MAX_USERS, so memory is bounded however many users come and go.
+    """
+
+    def __init__(self, floor: int):
+        # { user_id: deque[(event_id, frame)] } — least recently written first
+        self._events: "OrderedDict[str, deque]" = OrderedDict()
+        # { user_id: newest event_id that fell out of that user's ring }
+        self._dropped: Dict[str, int] = {}
+        # Events at or below this id may be missing for ANY user (worker start / LRU eviction)
+        self._floor = floor
+
+    def record(self, user_id: str, event_id: int, frame: "Frame"):
+        events = self._events.get(user_id)
+        if events is None:
+            events = self._events[user_id] = deque(maxlen=settings.WS_REPLAY_BUFFER_SIZE)
+        else:
+            self._events.move_to_end(user_id)
+        if len(events) == events.maxlen:
+            self._dropped[user_id] = events[0][0]
+        events.append((event_id, frame))
+
+        while len(self._events) > settings.WS_REPLAY_MAX_USERS:
+            evicted_user, evicted = self._events.popitem(last=False)
+            self._dropped.pop(evicted_user, None)
+            self._floor = max(self._floor, evicted[-1][0])
+
+    def since(self, user_id: str, last_event_id: int):
+        """
+        (frames the client may have missed, truncated?) — truncated means some were already dropped.
+
+        Event ids are only ordered per worker: an event published on another worker
+        can reach this buffer after one with a higher id. So once `last_event_id` is
+        found, everything recorded after it is replayed whatever its id, as well as
+        anything newer (the client skips ids it has already handled).
+        """
+        events = self._events.get(user_id, ())
+        floor = max(self._floor, self._dropped.get(user_id, 0))
+        position = next((i for i, (event_id, _) in enumerate(events) if event_id == last_event_id), len(events))
+        missed = [frame for i, (event_id, frame) in enumerate(events) if i > position or event_id > last_event_id]
+        return missed, last_event_id < floor
+
 
 class ConnectionManager:
     """
     Manages WebSocket connections per user_id (UUID string).
     A single customer can have multiple connections (e.g. multiple tabs/devices).
+
+    With several uvicorn workers a user's sockets may live in another process,
+    so every worker is attached to a shared broker (WS_BROKER):
+    - `send_to_user` delivers to this worker's sockets directly and publishes
+      the message for the workers that hold the user's other sockets
+    - presence is gossiped over the same broker (join / leave deltas, periodic
+      heartbeats, a full snapshot for workers that just started), so
+      `is_connected` is true when the user is online on ANY worker
     """
 
-    def __init__(self):
-        # { user_id: [websocket1, websocket2, ...] }
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    def __init__(self, broker: Optional[Broker] = None):
+        # { user_id: [connection1, connection2, ...] } — this worker only
+        self.active_connections: Dict[str, List[Connection]] = {}
+        self.metrics = WsMetrics()
 
-    async def connect(self, websocket: WebSocket, user_id: str):
-        """Accept the connection and register it under the user's ID."""
-        await websocket.accept()
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.broker = broker or create_broker()
+        # { user_id: {worker_id, ...} } — users connected to OTHER workers
+        self._remote_presence: Dict[str, Set[str]] = {}
+        # { worker_id: {user_id, ...} } and { worker_id: last heartbeat (monotonic) }
+        self._worker_users: Dict[str, Set[str]] = {}
+        self._worker_seen: Dict[str, float] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._reaper_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # { topic: {connection, ...} } — this worker's subscribers only
+        self._topics: Dict[str, Set[Connection]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Event ids: microsecond-clock based so they keep increasing across restarts, and
+        # never below an id seen from another worker — but only ordered per worker
+        # (clocks skew), so replay resumes by position, not by id (ReplayBuffer.since)
+        self._last_event_id = 0
+        self.replay = ReplayBuffer(floor=self._next_event_id())
+
+    # ------------------------------------------
+    # Lifecycle (app/main.py lifespan)
+    # ------------------------------------------
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self.broker.start(self._on_broker_message)
+        self._reaper_task = asyncio.create_task(self._reap_loop())
+        if self.broker.distributed:
+            # Ask the running workers who is online on them
+            await self._publish({"kind": "sync"})
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self.broker.distributed:
+            await self._publish({"kind": "bye"})
+        await self.broker.stop()
+
+    # ------------------------------------------
+    # Local connections
+    # ------------------------------------------
+    async def connect(
+        self,
+        websocket: WebSocket,
+        user_id: str,
+        subprotocol: Optional[str] = None,
+        last_event_id: Optional[int] = None,
+    ) -> Connection:
+        """
+        Accept the connection and register it under the user's ID.
+        With `last_event_id`, the events the client missed are queued first.
+        """
+        await websocket.accept(subprotocol=subprotocol)
+        connection = Connection(websocket, user_id, self, binary=subprotocol == MSGPACK_SUBPROTOCOL)
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
+            self._announce("join", user_id)
+        self.active_connections[user_id].append(connection)
+
+        # No await between registering and replaying, so no live event can slip in between
+        if last_event_id is not None:
+            missed, truncated = self.replay.since(user_id, last_event_id)
+            if truncated:
+                # Some events are gone — the client must refetch /notifications
+                connection.enqueue(Frame({"type": "resync_required", "last_event_id": last_event_id}))
+            for frame in missed:
+                connection.enqueue(frame)
+        return connection
 
     def disconnect(self, websocket: WebSocket, user_id: str):
         """Remove the connection when the client disconnects."""
-        if user_id in self.active_connections:
-            self.active_connections[user_id].remove(websocket)
-            # Clean up empty lists
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-
-    async def send_to_user(self, user_id: str, message: dict):
-        """Send a JSON message to ALL connections for a specific user."""
-        if user_id in self.active_connections:
-            dead_connections = []
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    dead_connections.append(connection)
-            
-            # Clean up any dead connections
-            for dc in dead_connections:
-                self.active_connections[user_id].remove(dc)
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            return
+        for connection in [c for c in connections if c.websocket is websocket]:
+            connection.stop()
+            connections.remove(connection)
+            for topic in list(connection.topics):
+                self.unsubscribe(connection, topic)
+        # Clean up empty lists
+        if not connections:
+            del self.active_connections[user_id]
+            self._announce("leave", user_id)
+
+    def evict(self, connection: Connection, reason: str):
+        """Drop a slow consumer and close its socket (1013 = try again later)."""
+        if connection.closed:
+            return
+        self.metrics.evicted += 1
+        print(f"⚠️ Evicting WebSocket for user {connection.user_id}: {reason}")
+        self._drop(connection, 1013)
+
+    def _drop(self, connection: Connection, code: int):
+        # Forget it right away — a half-open socket may never finish closing
+        self.disconnect(connection.websocket, connection.user_id)
+        self._spawn(self._close_quietly(connection.websocket, code))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+
+    def handle_client_message(self, connection: Connection, data: Union[str, bytes]) -> Optional[dict]:
+        """
+        Called for every frame a client sends; any frame proves the socket is alive.
+        Heartbeats are handled here; anything else is returned (parsed) to the caller.
+        Binary frames are MessagePack on the msgpack subprotocol, JSON otherwise.
+        """
+        connection.last_seen = time.monotonic()
+        try:
+            message = msgpack.unpackb(data) if isinstance(data, bytes) and connection.binary else orjson.loads(data)
+        except (ValueError, TypeError):
+            return None
+        if not isinstance(message, dict):
+            return None
+
+        if message.get("type") == "pong":
+            connection.answers_pings = True
+        elif message.get("type") == "ping":
+            connection.enqueue(PONG_FRAME)
+        else:
+            return message
+        return None
+
+    # ------------------------------------------
+    # Topics (order:<id>, shop:<id>, shop:<id>:inventory)
+    # ------------------------------------------
+    def subscribe(self, connection: Connection, topic: str) -> bool:
+        """Add the socket to the topic index. False if it already holds too many topics."""
+        if topic in connection.topics:
+            return True
+        if len(connection.topics) >= settings.WS_MAX_TOPICS_PER_CONNECTION:
+            return False
+        connection.topics.add(topic)
+        self._topics.setdefault(topic, set()).add(connection)
+        return True
+
+    def unsubscribe(self, connection: Connection, topic: str):
+        connection.topics.discard(topic)
+        subscribers = self._topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self._topics[topic]
+
+    async def publish(self, topic: str, message: dict):
+        """Send to every subscriber of `topic` (on every worker) — nobody else gets it."""
+        frame = Frame({"topic": topic, **message})
+        if self.broker.distributed:
+            self._spawn(self._publish({"kind": "topic", "topic": topic, "text": frame.text}))
+        self._deliver_topic(topic, frame)
+
+    def publish_threadsafe(self, topic: str, message: dict):
+        """`publish` for sync code (threadpool endpoints, session hooks, sweepers)."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(lambda: self._spawn(self.publish(topic, message)))
+
+    def run_threadsafe(self, coro) -> Optional[concurrent.futures.Future]:
+        """
+        Schedule `coro` on the event loop this manager was started on, from a
+        worker thread. Returns its concurrent Future (`.result(timeout)` waits
+        for it), or None — coroutine discarded — when no loop is running.
+        """
+        if self._loop is None or self._loop.is_closed():
+            coro.close()
+            return None
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _deliver_topic(self, topic: str, frame: Union[Frame, str]):
+        if isinstance(frame, str):
+            frame = Frame(text=frame)
+        for connection in list(self._topics.get(topic, ())):
+            connection.enqueue(frame)
+
+    # ------------------------------------------
+    # Heartbeats & reaping (one task for every socket on this worker)
+    # ------------------------------------------
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(settings.WS_REAPER_INTERVAL_SECONDS)
+            try:
+                reaped = self.reap()
+                if reaped:
+                    print(f"🧹 Reaped {reaped} dead WebSocket connection(s)")
+            except Exception as e:
+                print(f"❌ WebSocket reaper error: {e}")
+
+    def reap(self) -> int:
+        """
+        Ping sockets that have been quiet for WS_PING_INTERVAL_SECONDS and close
+        the ones that are gone:
+        - a client that answers pings but missed the last one for WS_PONG_TIMEOUT_SECONDS
+        - any client that sent nothing at all for WS_IDLE_TIMEOUT_SECONDS
+        """
+        now = time.monotonic()
+        reaped = 0
+        for connection in self.all_connections():
+            missed_pong = (
+                connection.answers_pings
+                and connection.last_ping_at > connection.last_seen
+                and now - connection.last_ping_at > settings.WS_PONG_TIMEOUT_SECONDS
+            )
+            if missed_pong or now - connection.last_seen > settings.WS_IDLE_TIMEOUT_SECONDS:
+                self._drop(connection, 1001)
+                reaped += 1
+            elif now - max(connection.last_seen, connection.last_ping_at) >= settings.WS_PING_INTERVAL_SECONDS:
+                connection.enqueue(PING_FRAME)
+                connection.last_ping_at = now
+
+        self.metrics.reaped += reaped
+        return reaped
+
+    def all_connections(self) -> List[Connection]:
+        return [c for connections in self.active_connections.values() for c in connections]
+
+    # ------------------------------------------
+    # Sending (never waits on a socket — messages are queued per connection)
+    # ------------------------------------------
+    async def send_to_user(self, user_id: str, message: dict) -> int:
+        """
+        Send a message to ALL connections for a specific user, on every worker (encoded once).
+        Offline users' messages are still buffered for replay. Returns the event id.
+        """
+        event_id = self._next_event_id()
+        self._send_frame(str(user_id), event_id, Frame({"event_id": event_id, **message}))
+        return event_id
+
+    async def send_text_to_user(self, user_id: str, text: str) -> int:
+        """Send an already-serialized JSON object string to ALL connections for a user, on every worker."""
+        event_id = self._next_event_id()
+        rest = text[1:].lstrip()
+        text = f'{{"event_id":{event_id}' + ("" if rest.startswith("}") else ",") + rest
+        self._send_frame(str(user_id), event_id, Frame(text=text))
+        return event_id
+
+    def _next_event_id(self) -> int:
+        self._last_event_id = max(time.time_ns() // 1000, self._last_event_id + 1)
+        return self._last_event_id
+
+    def _send_frame(self, user_id: str, event_id: int, frame: Frame):
+        self.replay.record(user_id, event_id, frame)
+        if self.broker.distributed:
+            # Every worker buffers the event — the user may reconnect to any of them
+            self._spawn(self._publish({"kind": "deliver", "user_id": user_id, "event_id": event_id, "text": frame.text}))
+        self._deliver_local(user_id, frame)
+
+    def _deliver_local(self, user_id: str, frame: Union[Frame, str]):
+        if isinstance(frame, str):
+            frame = Frame(text=frame)
+        for connection in list(self.active_connections.get(user_id, ())):
+            connection.enqueue(frame)
 
     def is_connected(self, user_id: str) -> bool:
-        """Check if the user has any active WebSocket connections."""
-        return bool(self.active_connections.get(user_id))
+        """Check if the user has any active WebSocket connections (on any worker)."""
+        user_id = str(user_id)
+        return bool(self.active_connections.get(user_id)) or bool(self._remote_presence.get(user_id))
+
+    # ------------------------------------------
+    # Broker messages
+    # ------------------------------------------
+    async def _publish(self, envelope: dict):
+        envelope["worker"] = self.worker_id
+        try:
+            await self.broker.publish(encode(envelope))
+        except Exception as e:
+            print(f"❌ WebSocket broker publish error: {e}")
+
+    def _announce(self, kind: str, user_id: str):
+        """Presence delta — fire and forget, connect/disconnect must not wait on the broker."""
+        if self.broker.distributed:
+            self._spawn(self._publish({"kind": kind, "user_id": user_id}))
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_broker_message(self, payload: str):
+        envelope = orjson.loads(payload)
+        worker = envelope.get("worker")
+        if worker == self.worker_id:
+            return  # Our own echo
+
+        kind = envelope["kind"]
+        if kind == "deliver":
+            event_id, frame = envelope["event_id"], Frame(text=envelope["text"])
+            self._last_event_id = max(self._last_event_id, event_id)
+            self.replay.record(envelope["user_id"], event_id, frame)
+            self._deliver_local(envelope["user_id"], frame)
+            return
+        if kind == "topic":
+            self._deliver_topic(envelope["topic"], envelope["text"])
+            return
+
+        self._worker_seen[worker] = time.monotonic()
+        if kind == "join":
+            self._add_remote(worker, envelope["user_id"])
+        elif kind == "leave":
+            self._remove_remote(worker, envelope["user_id"])
+        elif kind == "snapshot":
+            for user_id in set(self._worker_users.get(worker, ())) - set(envelope["users"]):
+                self._remove_remote(worker, user_id)
+            for user_id in envelope["users"]:
+                self._add_remote(worker, user_id)
+        elif kind == "sync":
+            self._spawn(self._publish({"kind": "snapshot", "users": list(self.active_connections)}))
+        elif kind == "bye":
+            self._forget_worker(worker)
+
+    def _add_remote(self, worker: str, user_id: str):
+        self._remote_presence.setdefault(user_id, set()).add(worker)
+        self._worker_users.setdefault(worker, set()).add(user_id)
+
+    def _remove_remote(self, worker: str, user_id: str):
+        workers = self._remote_presence.get(user_id)
+        if workers:
+            workers.discard(worker)
+            if not workers:
+                del self._remote_presence[user_id]
+        self._worker_users.get(worker, set()).discard(user_id)
+
+    def _forget_worker(self, worker: str):
+        for user_id in self._worker_users.pop(worker, set()):
+            self._remove_remote(worker, user_id)
+        self._worker_seen.pop(worker, None)
+
+    async def _heartbeat(self):
+        """
+        Periodic full snapshot: repairs any missed join/leave, and a worker that
+        stops sending them (crashed, killed) is forgotten after 3 missed beats.
+        """
+        interval = settings.WS_PRESENCE_HEARTBEAT_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._publish({"kind": "snapshot", "users": list(self.active_connections)})
+                cutoff = time.monotonic() - 3 * interval
+                for worker in [w for w, seen in self._worker_seen.items() if seen < cutoff]:
+                    print(f"⚠️ WebSocket worker {worker} stopped sending heartbeats — dropping its presence")
+                    self._forget_worker(worker)
+            except Exception as e:
+                print(f"❌ WebSocket presence heartbeat error: {e}")
 
 
 # Single global instance — imported everywhere
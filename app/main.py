@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
+from contextlib import asynccontextmanager
 import os
 
 from app.core.config import settings
@@ -10,13 +11,13 @@ from app.db.session import engine
 from app.db.base import Base
 
 # Import Routers
-from app.api import products, product_categories, product_subcategories, shops, inventory, orders, upload, ws, agents, categories, customer_auth, merchant_auth, admin_auth, users, notifications, internal
+from app.api import products, product_categories, product_subcategories, shops, inventory, orders, upload, ws, agents, categories, customer_auth, merchant_auth, admin_auth, users, notifications, internal, cart
 
 # ==========================================
 # THE "UNUSED" IMPORTS (Model Registration)
 # ==========================================
 # We import these files so SQLAlchemy reads them and registers them to Base.metadata
-from app.models import user, product, product_category, product_subcategory, shop, inventory as model_inventory, order, cart_suggestion, agent, notification
+from app.models import user, product, product_category, product_subcategory, shop, inventory as model_inventory, order, cart_suggestion, agent, notification, stock_hold, ocr_job, ocr_cache
 
 # ==========================================
 # TABLE MIGRATIONS (Powered by Alembic)
@@ -26,7 +27,42 @@ from app.models import user, product, product_category, product_subcategory, sho
 #   alembic revision --autogenerate -m "describe your change"
 #   alembic upgrade head
 
-app = FastAPI(title=settings.PROJECT_NAME)
+from app.core.ws_manager import manager
+from app.services.hold_sweeper import hold_sweeper
+from app.services.low_stock import low_stock_digest
+from app.services.push_service import push_dispatcher
+from app.services.notification_coalescer import notification_coalescer
+from app.services.ocr_worker import ocr_worker
+
+
+# ==========================================
+# BACKGROUND WORKERS (started with the app)
+# ==========================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Joins the WebSocket broker so pushes reach users connected to other workers
+    await manager.start()
+    # Sends offline users' native pushes in batches (no-op unless FCM_ENABLED)
+    await push_dispatcher.start()
+    # Releases lapsed cart holds back into inventory
+    await hold_sweeper.start()
+    # Debounces low-stock crossings into one digest notification per shop
+    await low_stock_digest.start()
+    # Runs queued chitty OCR jobs in a process pool (or run `python -m app.services.ocr_worker`)
+    if settings.OCR_WORKER_EMBEDDED:
+        await ocr_worker.start()
+    yield
+    await ocr_worker.stop()
+    await low_stock_digest.stop()
+    await hold_sweeper.stop()
+    # Deliver order updates still waiting out their coalescing window
+    await notification_coalescer.flush_all()
+    # Stopped last so the final low-stock digests still get their pushes out
+    await push_dispatcher.stop()
+    await manager.stop()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 
 # ==========================================
@@ -103,6 +139,7 @@ app.include_router(product_subcategories.router, prefix="/api/v1/product-subcate
 app.include_router(shops.router, prefix="/api/v1/shops", tags=["Shops"])
 app.include_router(inventory.router, prefix="/api/v1/inventory", tags=["Inventory"])
 app.include_router(orders.router, prefix="/api/v1/orders", tags=["Orders"])
+app.include_router(cart.router, prefix="/api/v1/cart", tags=["Cart"])
 app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["Notifications"])
 app.include_router(internal.router, prefix="/api/v1/internal", tags=["Internal"])
 app.include_router(upload.router, prefix="/api/v1/upload", tags=["Uploads"])
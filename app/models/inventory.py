@@ -14,4 +14,7 @@ class InventoryItem(Base):
     
     # Store-specific details
     price = Column(Float, nullable=False)  # The price this specific shop is charging
-    stock = Column(Integer, default=0)     # How many items they have on the shelf
\ No newline at end of file
+    stock = Column(Integer, default=0)     # How many items they have on the shelf
+
+    # Low-stock alerting: notify the merchant once stock drops to this level (None = off)
+    reorder_level = Column(Integer, nullable=True)
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Boolean, Text, ForeignKey, DateTime
+from sqlalchemy import Column, String, Boolean, Integer, Text, ForeignKey, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID, JSON
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -10,8 +10,8 @@ class Notification(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
 
-    # Who receives this notification
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    # Who receives this notification (indexed by the composite inbox indexes below)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
     # Notification content
     title = Column(String, nullable=False)           # e.g. "New Order Received!"
@@ -26,3 +26,48 @@ class Notification(Base):
 
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Inbox pages: WHERE user_id = ? [AND is_read = false] ORDER BY created_at DESC, id DESC
+        # Both orderings are read straight off an index, including keyset (cursor) pages.
+        Index("ix_notifications_user_read_created", "user_id", "is_read", created_at.desc(), id.desc()),
+        Index("ix_notifications_user_created", "user_id", created_at.desc(), id.desc()),
+        # Retention job: oldest read rows first, without scanning unread history
+        Index("ix_notifications_read_created", created_at, postgresql_where=(is_read == True)),
+    )
+
+
+class NotificationArchive(Base):
+    """
+    Cold storage for old, already-read notifications. The retention job
+    (app/services/notification_retention.py) moves rows here in batches so the
+    hot `notifications` table — and every inbox query — only holds recent and
+    unread history.
+    """
+    __tablename__ = "notifications_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    title = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    type = Column(String, nullable=False)
+    data = Column(JSON, nullable=True)
+    is_read = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_notifications_archive_user_created", "user_id", created_at.desc()),
+    )
+
+
+class NotificationCounter(Base):
+    """
+    Maintained unread count per user, so the app's unread badge is a primary-key
+    lookup instead of a count(*) over the whole inbox. Updated in the same
+    transaction as every insert / mark-as-read (see app/services/unread_counter.py).
+    """
+    __tablename__ = "notification_counters"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
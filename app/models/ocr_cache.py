@@ -0,0 +1,41 @@
+import uuid
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class OcrCacheEntry(Base):
+    """
+    Tesseract's lines for one image, so a re-uploaded chitty (repeat weekly
+    orders) is never OCR'd twice. Keyed by the SHA-256 of the file plus the
+    OCR settings that produced the lines; `dhash` finds near-duplicates
+    (the same photo re-compressed or resized by the app) of the same customer.
+    Least recently used entries are evicted past OCR_CACHE_MAX_ENTRIES.
+    """
+    __tablename__ = "ocr_cache_entries"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+
+    # sha256 of the image bytes (hex) and the OCR settings fingerprint (preprocessing, psm, oem, lang)
+    content_hash = Column(String(64), nullable=False)
+    ocr_config = Column(String, nullable=False)
+
+    # 256-bit difference hash (hex) of the upright grayscale image
+    dhash = Column(String(64), nullable=False)
+
+    # Who uploaded it — near-duplicate matches are only trusted within one customer's uploads
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+
+    lines = Column(JSON, nullable=False, default=list)
+    hits = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_ocr_cache_entries_content_hash_ocr_config", "content_hash", "ocr_config", unique=True),
+        Index("ix_ocr_cache_entries_customer_id_last_used_at", "customer_id", "last_used_at"),
+        # Eviction drops the least recently used
+        Index("ix_ocr_cache_entries_last_used_at", "last_used_at"),
+    )
@@ -0,0 +1,42 @@
+import uuid
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class OcrJob(Base):
+    """
+    One chitty OCR run for an order, queued in the same transaction as the order.
+    Workers claim due jobs with FOR UPDATE SKIP LOCKED, so any number of worker
+    processes can share the table without ever taking the same job.
+    """
+    __tablename__ = "ocr_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id"), nullable=False, index=True)
+
+    # Values: "queued", "running", "done", "failed"
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+
+    # Progress of the current attempt (every image of the order is OCR'd in parallel)
+    images_total = Column(Integer, nullable=False, default=0)
+    images_done = Column(Integer, nullable=False, default=0)
+
+    # Not picked up before this (retry backoff)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    # Which worker holds it and since when — a "running" job whose lease ran out is claimed again
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # The claim query scans only due, queued jobs
+        Index("ix_ocr_jobs_status_run_after", "status", "run_after"),
+    )
@@ -26,6 +26,9 @@ class Order(Base):
     # NEW: General instructions for the whole order (e.g., "Deliver after 5 PM")
     order_notes = Column(Text, nullable=True)
 
+    # Chitty OCR progress: None (no images), "queued", "processing", "done", "failed"
+    ocr_status = Column(String, nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     items = relationship("OrderItem", backref="order")
 
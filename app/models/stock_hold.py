@@ -0,0 +1,31 @@
+import uuid
+from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class StockHold(Base):
+    """
+    A time-limited reservation of shop stock for a customer's cart.
+    The held quantity is taken out of InventoryItem.stock when the hold is
+    created and either consumed by checkout or given back when it expires.
+    """
+    __tablename__ = "stock_holds"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+
+    # Which shelf the stock was taken from
+    inventory_item_id = Column(UUID(as_uuid=True), ForeignKey("inventory_items.id"), nullable=False, index=True)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id"), nullable=False)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
+
+    # Who is holding it
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+
+    quantity = Column(Integer, nullable=False)
+
+    # The sweeper releases the hold once this passes
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Any
+from typing import List, Optional, Any
 from datetime import datetime
 from uuid import UUID
 
@@ -21,5 +21,25 @@ class NotificationResponse(BaseModel):
         from_attributes = True
 
 
+class NotificationListItem(BaseModel):
+    """Lightweight inbox row — `data` is only filled when asked for (include_data=true)."""
+    id: UUID
+    title: str
+    body: str
+    type: str
+    is_read: bool
+    created_at: Optional[datetime] = None
+    data: Optional[Any] = None
+
+    class Config:
+        from_attributes = True
+
+
+class NotificationPage(BaseModel):
+    data: List[NotificationListItem]
+    # Pass this back as ?cursor= to get the next (older) page; null on the last page
+    next_cursor: Optional[str] = None
+
+
 class UnreadCountResponse(BaseModel):
     unread_count: int
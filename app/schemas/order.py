@@ -10,6 +10,9 @@ class OrderItemCreate(BaseModel):
     quantity: int = 1
     # NEW: For requests like "270g only" or "Make the Biryani extra spicy"
     special_instructions: Optional[str] = None
+    # Optional: the cart hold (POST /api/v1/cart/holds) backing this line.
+    # When set, product_id and quantity must match the hold; stock is not re-checked.
+    hold_id: Optional[UUID] = None
 
 class OrderItemProductDetail(BaseModel):
     id: UUID
@@ -76,6 +79,7 @@ class OrderResponse(BaseModel):
     total_amount: float
     status: str
     list_image_urls: Optional[List[str]] = []
+    ocr_status: Optional[str] = None
     order_notes: Optional[str] = None
     order_type: str
     scheduled_pickup_time: Optional[datetime] = None
@@ -93,6 +97,7 @@ class OrderResponse(BaseModel):
                 "total_amount": 120.50,
                 "status": "pending",
                 "list_image_urls": ["https://example.com/images/list.jpg"],
+                "ocr_status": "done",
                 "order_notes": "Call me when you reach downstairs",
                 "order_type": "instant",
                 "scheduled_pickup_time": "2026-03-21T20:18:54.147Z",
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+from uuid import UUID
+
+
+# ==========================================
+# CART STOCK HOLD SCHEMAS
+# ==========================================
+class StockHoldCreate(BaseModel):
+    shop_id: UUID
+    product_id: UUID
+    quantity: int = Field(1, gt=0, description="How many units to hold for this cart line")
+
+
+class StockHoldResponse(BaseModel):
+    id: UUID
+    inventory_item_id: UUID
+    shop_id: UUID
+    product_id: UUID
+    customer_id: UUID
+    quantity: int
+    expires_at: datetime
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
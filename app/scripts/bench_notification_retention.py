@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+# Add the project root to the python path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.session import SessionLocal
+from app.models.notification import Notification, NotificationArchive, NotificationCounter
+from app.models.user import User
+from app.api.notifications import list_inbox
+from app.services.notification_retention import apply_notification_retention
+
+# ==========================================
+# NOTIFICATION RETENTION BENCHMARK
+# ==========================================
+# Grows one heavy inbox round by round (like an admin receiving every order_timeout
+# alert) and times the inbox query after each round.
+# Run it twice: with --skip-retention the hot table keeps growing; with the
+# retention job running every round, latency should stay flat.
+#
+# Usage (against a throwaway database — it writes and then removes its own rows):
+#   python -m app.scripts.bench_notification_retention --rounds 5 --rows-per-round 50000
+#   python -m app.scripts.bench_notification_retention --rounds 5 --rows-per-round 50000 --skip-retention
+# ==========================================
+
+
+def create_bench_user(db: Session) -> User:
+    user = User(
+        full_name="Retention Bench",
+        phone_number=f"bench-{uuid.uuid4().hex[:12]}",
+        role="bench",
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def add_history(db: Session, user: User, rows: int, retention_days: int):
+    """Mostly old read history, plus a recent tail that stays in the hot table."""
+    now = datetime.now(timezone.utc)
+    batch = []
+    for i in range(rows):
+        is_old = random.random() < 0.9
+        age = timedelta(days=random.uniform(retention_days + 1, retention_days * 4)) if is_old \
+            else timedelta(days=random.uniform(0, retention_days - 1))
+        batch.append({
+            "id": uuid.uuid4(),
+            "user_id": user.id,
+            "title": "🚨 Overdue Order Alert!",
+            "body": f"Order #{i} has been pending for over 15 minutes!",
+            "type": "order_timeout",
+            "data": {"order_id": str(uuid.uuid4()), "shop_name": "Bench Shop"},
+            "is_read": is_old or random.random() < 0.5,
+            "created_at": now - age,
+        })
+        if len(batch) == 5000:
+            db.execute(insert(Notification.__table__), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Notification.__table__), batch)
+    db.commit()
+
+
+def time_inbox(db: Session, user: User, samples: int) -> dict:
+    """p50 / p95 latency (ms) of the first inbox page and a deep cursor page."""
+    first, deep = [], []
+    for _ in range(samples):
+        start = time.perf_counter()
+        page = list_inbox(cursor=None, limit=50, unread_only=False, include_data=False, db=db, current_user=user)
+        first.append((time.perf_counter() - start) * 1000)
+
+        cursor = page["next_cursor"]
+        for _ in range(10):  # walk ten pages deep
+            if not cursor:
+                break
+            start = time.perf_counter()
+            page = list_inbox(cursor=cursor, limit=50, unread_only=False, include_data=False, db=db, current_user=user)
+            deep.append((time.perf_counter() - start) * 1000)
+            cursor = page["next_cursor"]
+
+    def pct(values, q):
+        return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else (values[0] if values else 0.0)
+
+    return {
+        "first_p50": pct(first, 50), "first_p95": pct(first, 95),
+        "deep_p50": pct(deep, 50), "deep_p95": pct(deep, 95),
+    }
+
+
+def hot_rows(db: Session, user: User) -> int:
+    return db.query(Notification).filter(Notification.user_id == user.id).count()
+
+
+def cleanup(db: Session, user: User):
+    db.query(Notification).filter(Notification.user_id == user.id).delete()
+    db.query(NotificationArchive).filter(NotificationArchive.user_id == user.id).delete()
+    db.query(NotificationCounter).filter(NotificationCounter.user_id == user.id).delete()
+    db.query(User).filter(User.id == user.id).delete()
+    db.commit()
+
+
+def run(rounds: int, rows_per_round: int, retention_days: int, samples: int, skip_retention: bool):
+    random.seed(42)
+    db = SessionLocal()
+    user = create_bench_user(db)
+    try:
+        print(f"📈 {rounds} round(s) × {rows_per_round} notification(s), retention = {retention_days} days\n")
+        print(f"{'round':>5} {'history':>9} {'hot rows':>9} {'first p50':>10} {'first p95':>10} {'deep p50':>9} {'deep p95':>9}   phase")
+
+        history = 0
+        for r in range(1, rounds + 1):
+            add_history(db, user, rows_per_round, retention_days)
+            history += rows_per_round
+
+            if skip_retention:
+                timings = time_inbox(db, user, samples)
+                print(f"{r:>5} {history:>9} {hot_rows(db, user):>9} "
+                      f"{timings['first_p50']:>9.2f}ms {timings['first_p95']:>9.2f}ms "
+                      f"{timings['deep_p50']:>8.2f}ms {timings['deep_p95']:>8.2f}ms   no retention")
+                continue
+
+            start = time.perf_counter()
+            moved = apply_notification_retention(db, older_than_days=retention_days)
+            elapsed = time.perf_counter() - start
+
+            after = time_inbox(db, user, samples)
+            print(f"{r:>5} {history:>9} {hot_rows(db, user):>9} "
+                  f"{after['first_p50']:>9.2f}ms {after['first_p95']:>9.2f}ms "
+                  f"{after['deep_p50']:>8.2f}ms {after['deep_p95']:>8.2f}ms   "
+                  f"after retention ({moved} archived in {elapsed:.2f}s)")
+
+        print("\n🎉 Done. With retention, latency should stay flat as history grows.")
+    finally:
+        cleanup(db, user)
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark inbox latency with and without notification retention.")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--rows-per-round", type=int, default=50000)
+    parser.add_argument("--retention-days", type=int, default=90)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--skip-retention", action="store_true", help="Baseline: let the hot table grow")
+    args = parser.parse_args()
+    run(args.rounds, args.rows_per_round, args.retention_days, args.samples, args.skip_retention)
@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import itertools
+import tempfile
+import statistics
+
+import pytesseract
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add the project root to the python path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.db.base import Base
+from app.main import app  # noqa: F401 — registers every model, so relationships resolve
+from app.models.inventory import InventoryItem
+from app.models.product import Product
+from app.services.ocr import clean_ocr_lines, match_products
+from app.services.ocr_preprocess import preprocess_image, tesseract_config
+from app.scripts.bench_ocr_preprocess import render_chitty
+from app.scripts.bench_product_matcher import build_catalog
+
+# ==========================================
+# OCR PIPELINE BENCHMARK (render → OCR → match)
+# ==========================================
+# A fixed yardstick for every preprocessing / OCR / matcher change:
+#
+#   1. Builds a seeded synthetic catalog and loads it into an in-memory
+#      SQLite database (no Postgres needed, nothing of yours is touched)
+#   2. Renders handwritten-style chitties of products from it, for every
+#      combination of --noise × --rotation × --lines (--per-cell each)
+#   3. Runs each one end to end, timing every stage on its own: the same
+#      preprocess + Tesseract call as extract_text_from_image (current OCR_*
+#      settings), then match_products
+#   4. Reports per-stage latency (p50 / p95), throughput, and precision /
+#      recall of the matched products against what was written
+#
+# Same seed → same catalog, same chitties: compare runs before and after
+# a change (--json saves the numbers).
+#
+# Usage (needs the `tesseract` binary):
+#   python -m app.scripts.bench_ocr_pipeline --catalog 5000 --noise 0 15 30 --rotation 0 4 8 --lines 5 10 15
+#   python -m app.scripts.bench_ocr_pipeline --shop-size 300 --json results.json
+#   OCR_PREPROCESS=false python -m app.scripts.bench_ocr_pipeline   # any OCR_* setting via env
+# ==========================================
+
+STAGES = ("preprocess", "tesseract", "match", "total")
+
+
+def chitty_line(name: str, rng: random.Random) -> str:
+    """How a customer writes a product down: sometimes no brand, a quantity, any case."""
+    words = name.split()
+    if len(words) > 2 and rng.random() < 0.3:
+        words = words[1:]
+    line = " ".join(words)
+    if rng.random() < 0.4:
+        line = line.lower()
+    return rng.choice(["", "", "1 ", "2 x ", "- "]) + line
+
+
+def load_catalog(catalog_size: int, shop_size: int, rng: random.Random):
+    """In-memory database with the synthetic catalog (+ one shop's inventory). Returns (session, {id: name}, shop_id)."""
+    engine = create_engine("sqlite://")
+    tables = ("products", "inventory_items", "product_categories", "product_subcategories", "product_category_link")
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in tables])
+    db = sessionmaker(bind=engine)()
+
+    merchant_id = uuid.uuid4()
+    products = {uuid.uuid4(): name for name in build_catalog(catalog_size, rng).values()}
+    db.add_all(Product(id=pid, name=name, merchant_id=merchant_id, mrp=10) for pid, name in products.items())
+    db.commit()
+
+    shop_id = None
+    if shop_size:
+        shop_id = uuid.uuid4()
+        stocked = rng.sample(list(products), min(shop_size, len(products)))
+        db.add_all(InventoryItem(shop_id=shop_id, product_id=pid, price=10, stock=10) for pid in stocked)
+        db.commit()
+        products = {pid: products[pid] for pid in stocked}  # Chitties are written from what the shop sells
+    return db, products, shop_id
+
+
+def run_one(path: str, written_ids, db, shop_id):
+    """One chitty end to end. Returns ({stage: seconds}, true positives, matched, written)."""
+    timings = {"preprocess": 0.0}
+    with Image.open(path) as img:
+        # Same steps as extract_text_from_image, each timed on its own
+        if settings.OCR_PREPROCESS:
+            start = time.perf_counter()
+            img = preprocess_image(img)
+            timings["preprocess"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        raw_text = pytesseract.image_to_string(
+            img,
+            lang=settings.OCR_TESSERACT_LANG,
+            config=tesseract_config(settings.OCR_PREPROCESS),
+        )
+        timings["tesseract"] = time.perf_counter() - start
+    lines = clean_ocr_lines(raw_text)
+
+    start = time.perf_counter()
+    matches = match_products(lines, db, shop_id)
+    timings["match"] = time.perf_counter() - start
+    timings["total"] = timings["preprocess"] + timings["tesseract"] + timings["match"]
+
+    matched = {m["product_id"] for m in matches if m["product_id"] is not None}
+    written = set(written_ids)
+    return timings, len(matched & written), len(matched), len(written)
+
+
+def summarize(rows):
+    """rows: [(timings, tp, matched, written)] → one result dict."""
+    tp = sum(r[1] for r in rows)
+    matched = sum(r[2] for r in rows)
+    written = sum(r[3] for r in rows)
+    result = {
+        "images": len(rows),
+        "precision": tp / matched if matched else 0.0,
+        "recall": tp / written if written else 0.0,
+        "images_per_second": len(rows) / sum(r[0]["total"] for r in rows),
+    }
+    for stage in STAGES:
+        ms = sorted(r[0][stage] * 1000 for r in rows)
+        result[f"{stage}_p50_ms"] = statistics.median(ms)
+        result[f"{stage}_p95_ms"] = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return result
+
+
+def print_row(label: str, result: dict):
+    stages = "".join(f" {result[f'{stage}_p50_ms']:>7.0f}/{result[f'{stage}_p95_ms']:<7.0f}" for stage in STAGES)
+    print(f"{label:<22} {result['images']:>4}{stages} {result['images_per_second']:>7.2f} {result['precision']:>9.1%} {result['recall']:>7.1%}")
+
+
+def run(args):
+    if not shutil.which("tesseract"):
+        sys.exit("❌ The `tesseract` binary is not installed (brew install tesseract)")
+
+    rng = random.Random(args.seed)
+    db, products, shop_id = load_catalog(args.catalog, args.shop_size, rng)
+    product_ids = list(products)
+    match_products(["warm up"], db, shop_id)  # Builds the match indexes, so the first chitty isn't timed with it
+    print(f"📦 {args.catalog} products" + (f", matching against a shop of {len(products)}" if shop_id else ""))
+    print(f"⚙️  preprocess={settings.OCR_PREPROCESS} --oem {settings.OCR_TESSERACT_OEM} --psm {settings.OCR_TESSERACT_PSM}, seed {args.seed}\n")
+
+    header = "".join(f" {stage + ' p50/p95':>15}" for stage in STAGES)
+    print(f"{'noise / rot / lines':<22} {'imgs':>4}{header} {'img/s':>7} {'precision':>9} {'recall':>7}")
+
+    all_rows, cells = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for noise, rotation, length in itertools.product(args.noise, args.rotation, args.lines):
+            rows = []
+            for i in range(args.per_cell):
+                written_ids = rng.sample(product_ids, min(length, len(product_ids)))
+                lines = [chitty_line(products[pid], rng) for pid in written_ids]
+                angle = rng.choice([-1, 1]) * rotation
+                path = os.path.join(tmp, f"chitty_{noise}_{rotation}_{length}_{i}.jpg")
+                render_chitty(lines, rng, angle, noise, args.font).save(path, quality=88)
+                rows.append(run_one(path, written_ids, db, shop_id))
+
+            result = summarize(rows)
+            print_row(f"{noise:>3} / {rotation:>3}° / {length:>3}", result)
+            cells.append({"noise": noise, "rotation": rotation, "lines": length, **result})
+            all_rows.extend(rows)
+
+    overall = summarize(all_rows)
+    print("-" * 120)
+    print_row("all", overall)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "overall": overall, "cells": cells}, f, indent=2)
+        print(f"\n💾 Saved to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end OCR + matching benchmark on synthetic chitties.")
+    parser.add_argument("--catalog", type=int, default=5000, help="Products in the synthetic catalog")
+    parser.add_argument("--shop-size", type=int, default=0, help="Match against one shop's inventory of this many products (0 → catalog only)")
+    parser.add_argument("--noise", type=int, nargs="+", default=[0, 15, 30])
+    parser.add_argument("--rotation", type=float, nargs="+", default=[0, 4, 8], help="Page tilt in degrees (random direction)")
+    parser.add_argument("--lines", type=int, nargs="+", default=[5, 10, 15], help="Items per chitty")
+    parser.add_argument("--per-cell", type=int, default=3, help="Chitties per noise × rotation × lines combination")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--font", default=None, help="A .ttf to write with (a handwriting font makes it more realistic)")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    run(parser.parse_args())
@@ -0,0 +1,157 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import shutil
+
+import pytesseract
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageFont
+
+# Add the project root to the python path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.ocr import clean_ocr_lines
+from app.services.ocr_preprocess import preprocess_image, tesseract_config
+from app.services.product_matcher import MATCH_THRESHOLD, normalize, score_match
+
+# ==========================================
+# OCR PREPROCESSING BENCHMARK
+# ==========================================
+# Renders phone-photo sized (3024x4032) "handwritten" chitties — letters of
+# uneven size and baseline, a tilted page, a lighting gradient, sensor noise —
+# and OCRs each one twice:
+#
+#   raw          → the photo straight into Tesseract (OCR_PREPROCESS=False)
+#   preprocessed → app/services/ocr_preprocess.py first (OCR_PREPROCESS=True)
+#
+# Reports per image: preprocessing time, Tesseract time, and line yield —
+# the share of written lines that came back close enough to be matched
+# (score above MATCH_THRESHOLD), plus junk lines that match nothing written.
+#
+# Usage (needs the `tesseract` binary, no database):
+#   python -m app.scripts.bench_ocr_preprocess --images 20 --max-rotation 6 --noise 18
+# ==========================================
+
+ITEMS = [
+    "Aashirvaad Atta 10kg", "Tata Salt 1kg", "Amul Butter 500g", "Fortune Sunflower Oil 1L",
+    "Toor Dal 2kg", "Basmati Rice 5kg", "Sugar 1kg", "Maggi Noodles", "Surf Excel 1kg",
+    "Colgate Toothpaste", "Red Label Tea 500g", "Parle G Biscuits", "Moong Dal 1kg",
+    "Britannia Bread", "Amul Milk 1L", "Dettol Soap", "Vim Bar", "MDH Garam Masala",
+]
+PHOTO_SIZE = (3024, 4032)
+
+
+def load_font(size: int, path: str = None):
+    for candidate in (path, "DejaVuSans.ttf"):
+        if candidate:
+            try:
+                return ImageFont.truetype(candidate, size)
+            except OSError:
+                pass
+    return ImageFont.load_default(size)
+
+
+def render_chitty(lines, rng: random.Random, rotation: float = 0.0, noise: int = 0, font_path: str = None) -> Image.Image:
+    """
+    A photo of a handwritten list: every letter gets its own size and baseline
+    wobble, the page is rotated by `rotation` degrees, lit unevenly, blurred a
+    little and given +/- `noise` levels of per-pixel noise.
+    """
+    width, height = PHOTO_SIZE
+    page = Image.new("L", (width, height), color=235)
+    draw = ImageDraw.Draw(page)
+    fonts = [load_font(size, font_path) for size in (100, 110, 120)]
+
+    y = 250
+    for line in lines:
+        x = 220 + rng.randint(-40, 40)
+        for char in line:
+            font = rng.choice(fonts)
+            draw.text((x, y + rng.randint(-8, 8)), char, fill=rng.randint(10, 60), font=font)
+            x += draw.textlength(char, font=font) + rng.randint(-2, 6)
+        y += 190 + rng.randint(-25, 25)
+
+    page = page.rotate(rotation, resample=Image.BICUBIC, fillcolor=235)
+
+    # Uneven light: the page fades to ~70% brightness towards one edge
+    light = Image.linear_gradient("L").transpose(rng.choice([Image.FLIP_TOP_BOTTOM, Image.ROTATE_90, Image.ROTATE_270]))
+    light = light.resize((width, height))
+    page = ImageChops.multiply(page, light.point(lambda v: 255 - v * 75 // 255))
+    page = page.filter(ImageFilter.GaussianBlur(1.2))
+
+    if noise:
+        page = ImageChops.add(page, Image.effect_noise((width, height), noise), offset=-128)
+    return page.convert("RGB")
+
+
+def line_yield(written, read):
+    """(share of written lines read back well enough to match, lines read that match nothing written)."""
+    written_lower = [normalize(line) for line in written]
+    found, junk = set(), 0
+    for line in read:
+        scores = [score_match(normalize(line), w) for w in written_lower]
+        best = max(range(len(scores)), key=scores.__getitem__)
+        if scores[best] > MATCH_THRESHOLD:
+            found.add(best)
+        else:
+            junk += 1
+    return len(found) / len(written), junk
+
+
+def timed_ocr(path: str, preprocess: bool):
+    """(preprocess seconds, tesseract seconds, lines) for one image."""
+    prep_seconds = 0.0
+    with Image.open(path) as img:
+        # Same steps as extract_text_from_image, each timed on its own
+        if preprocess:
+            start = time.perf_counter()
+            img = preprocess_image(img)
+            prep_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        raw_text = pytesseract.image_to_string(img, lang=settings.OCR_TESSERACT_LANG, config=tesseract_config(preprocess))
+        tesseract_seconds = time.perf_counter() - start
+    return prep_seconds, tesseract_seconds, clean_ocr_lines(raw_text)
+
+
+def run(images: int, max_rotation: float, noise: int, seed: int, font_path: str):
+    if not shutil.which("tesseract"):
+        sys.exit("❌ The `tesseract` binary is not installed (brew install tesseract)")
+
+    rng = random.Random(seed)
+    results = {"raw": [], "preprocessed": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(images):
+            written = rng.sample(ITEMS, rng.randint(5, 12))
+            path = os.path.join(tmp, f"chitty_{i}.jpg")
+            render_chitty(written, rng, rng.uniform(-max_rotation, max_rotation), noise, font_path).save(path, quality=88)
+
+            for label, preprocess in (("raw", False), ("preprocessed", True)):
+                prep, ocr, lines = timed_ocr(path, preprocess)
+                found, junk = line_yield(written, lines)
+                results[label].append((prep, ocr, found, junk))
+
+    print(f"🖼️  {images} synthetic handwritten chitties {PHOTO_SIZE[0]}x{PHOTO_SIZE[1]}, rotation ±{max_rotation}°, noise {noise}")
+    print(f"⚙️  --oem {settings.OCR_TESSERACT_OEM} --psm {settings.OCR_TESSERACT_PSM}, target {settings.OCR_TARGET_DPI} DPI\n")
+    print(f"{'':<13} {'prep ms':>8} {'tesseract ms':>13} {'total ms':>9} {'line yield':>11} {'junk/img':>9}")
+    for label, rows in results.items():
+        prep = statistics.mean(r[0] for r in rows) * 1000
+        ocr = statistics.mean(r[1] for r in rows) * 1000
+        found = statistics.mean(r[2] for r in rows)
+        junk = statistics.mean(r[3] for r in rows)
+        print(f"{label:<13} {prep:>8.0f} {ocr:>13.0f} {prep + ocr:>9.0f} {found:>11.1%} {junk:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark OCR time and line yield with and without preprocessing.")
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--max-rotation", type=float, default=6.0)
+    parser.add_argument("--noise", type=int, default=18)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--font", default=None, help="A .ttf to write with (a handwriting font makes it more realistic)")
+    args = parser.parse_args()
+    run(args.images, args.max_rotation, args.noise, args.seed, args.font)
@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Add the project root to the python path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ocr import extract_text_from_image
+
+# ==========================================
+# OCR WORKER THROUGHPUT BENCHMARK
+# ==========================================
+# Runs Tesseract over the same synthetic chitty photos three ways and, while
+# it does, measures how late a 10ms timer on the event loop fires (what every
+# API request on that worker would feel):
+#
+#   threads   → the old BackgroundTasks path (OCR in the API's threadpool)
+#   processes → the OCR worker's ProcessPoolExecutor, at each --concurrency
+#
+# Usage (needs the `tesseract` binary, no database):
+#   python -m app.scripts.bench_ocr_worker --images 40 --concurrency 1 2 4
+# ==========================================
+
+ITEMS = [
+    "Aashirvaad Atta 10kg", "Tata Salt 1kg", "Amul Butter 500g", "Fortune Sunflower Oil 1L",
+    "Toor Dal 2kg", "Basmati Rice 5kg", "Sugar 1kg", "Maggi Noodles 12 pack",
+    "Surf Excel 1kg", "Colgate Toothpaste", "Red Label Tea 500g", "Parle G Biscuits",
+]
+
+
+def render_chitty(path: str, lines: int, rng: random.Random):
+    """A phone-photo sized (2400x3200) list with a few jittered lines of text."""
+    img = Image.new("L", (2400, 3200), color=245)
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 90)
+    except OSError:
+        font = ImageFont.load_default()
+    y = 150
+    for item in rng.sample(ITEMS, min(lines, len(ITEMS))):
+        draw.text((150 + rng.randint(-30, 30), y), f"{rng.randint(1, 3)} x {item}", fill=20, font=font)
+        y += 200 + rng.randint(-20, 20)
+    img.save(path, quality=90)
+
+
+async def measure(executor, paths):
+    """Process every image on `executor` while sampling event loop lag. Returns (seconds, lag samples)."""
+    loop = asyncio.get_running_loop()
+    lags = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append((time.perf_counter() - start - 0.01) * 1000)
+
+    prober = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(loop.run_in_executor(executor, extract_text_from_image, p) for p in paths))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await prober
+    return elapsed, lags
+
+
+def report(label, elapsed, lags, count):
+    lags = sorted(lags) or [0.0]
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{label:<16} {count / elapsed:>8.2f} img/s {elapsed:>8.1f}s   loop lag p50 {statistics.median(lags):>6.1f}ms  p99 {p99:>7.1f}ms")
+
+
+async def run(images: int, concurrency_levels, seed: int):
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(images):
+            path = os.path.join(tmp, f"chitty_{i}.jpg")
+            render_chitty(path, rng.randint(4, 12), rng)
+            paths.append(path)
+        print(f"🖼️  {images} synthetic chitties (2400x3200), {os.cpu_count()} CPU(s)\n")
+
+        # Old path: the API process' own threadpool (default size, like BackgroundTasks)
+        with ThreadPoolExecutor() as threads:
+            elapsed, lags = await measure(threads, paths)
+        report("threads", elapsed, lags, images)
+
+        for concurrency in concurrency_levels:
+            pool = ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context("spawn"))
+            # Warm up: process start-up isn't part of steady-state throughput
+            await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(pool, abs, 0) for _ in range(concurrency)))
+            elapsed, lags = await measure(pool, paths)
+            pool.shutdown()
+            report(f"processes x{concurrency}", elapsed, lags, images)
+
+    print("\n🎉 Done. Process pools should scale with cores while loop lag stays near zero.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark OCR throughput: threadpool vs process pool.")
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args.images, args.concurrency, args.seed))
@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import random
+import argparse
+import itertools
+
+# Add the project root to the python path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.product_matcher import MATCH_THRESHOLD, ProductIndex, match_lines, score_match
+
+# ==========================================
+# PRODUCT MATCHER BENCHMARK
+# ==========================================
+# Builds a synthetic catalog (brand × item × pack size), writes "chitty lines"
+# for random products with OCR-style noise, and matches them two ways:
+#
+#   full scan → the previous match_products: SequenceMatcher against every product
+#   index     → trigram candidates + the same exact score (match_lines)
+#
+# Reports time per line, the speedup, accuracy against the product each line
+# was written from, and how often the index found a match at least as good
+# as the full scan (the "no quality loss" check).
+#
+# Usage (no database needed):
+#   python -m app.scripts.bench_product_matcher --catalog 100000 --lines 50
+# ==========================================
+
+BRANDS = [
+    "Tata", "Amul", "Aashirvaad", "Fortune", "Britannia", "Parle", "Nestle", "Haldiram", "MDH", "Everest",
+    "Patanjali", "Dabur", "Colgate", "Surf Excel", "Ariel", "Vim", "Lizol", "Dettol", "Lifebuoy", "Lux",
+    "Saffola", "Dhara", "Catch", "Kissan", "Maggi", "Knorr", "Bru", "Nescafe", "Red Label", "Taj Mahal",
+    "Mother Dairy", "Nandini", "Aavin", "Heritage", "Gowardhan", "ID Fresh", "MTR", "Eastern", "Aachi", "Sakthi",
+    "Priya", "Mothers Recipe", "Bambino", "Sunfeast", "Cadbury", "Kurkure", "Lays", "Bingo", "Pringles", "Tropicana",
+]
+ITEMS = [
+    "Atta", "Salt", "Butter", "Sunflower Oil", "Mustard Oil", "Groundnut Oil", "Toor Dal", "Moong Dal", "Chana Dal",
+    "Urad Dal", "Basmati Rice", "Sona Masoori Rice", "Sugar", "Jaggery", "Tea", "Coffee", "Milk", "Curd", "Paneer",
+    "Ghee", "Cheese Slices", "Biscuits", "Cookies", "Rusk", "Bread", "Noodles", "Pasta", "Vermicelli", "Poha", "Rava",
+    "Besan", "Maida", "Turmeric Powder", "Chilli Powder", "Coriander Powder", "Garam Masala", "Sambar Powder",
+    "Rasam Powder", "Pickle", "Ketchup", "Jam", "Honey", "Corn Flakes", "Oats", "Detergent Powder", "Dishwash Bar",
+    "Floor Cleaner", "Handwash", "Bath Soap", "Shampoo", "Toothpaste", "Chips", "Namkeen", "Chocolate", "Juice",
+    "Idli Batter", "Dosa Batter", "Papad", "Tamarind", "Cumin Seeds", "Mustard Seeds", "Fennel", "Cardamom", "Cloves",
+    "Cashews", "Almonds", "Raisins", "Peanuts", "Soya Chunks", "Instant Upma", "Gulab Jamun Mix", "Custard Powder",
+    "Baking Soda", "Vinegar", "Soy Sauce", "Green Tea", "Energy Drink", "Mineral Water", "Soft Drink", "Ice Cream",
+]
+SIZES = ["50g", "100g", "200g", "250g", "500g", "1kg", "2kg", "5kg", "10kg", "100ml", "200ml", "500ml", "1L", "5L",
+         "Pack of 2", "Pack of 4", "Family Pack", "Value Pack", "Jar", "Pouch", "Refill", "Combo"]
+OCR_CONFUSIONS = {"l": "1", "o": "0", "i": "l", "s": "5", "m": "rn", "e": "c", "a": "o"}
+
+
+def build_catalog(size: int, rng: random.Random):
+    combos = list(itertools.product(BRANDS, ITEMS, SIZES))
+    rng.shuffle(combos)
+    names = [" ".join(c) for c in combos[:size]]
+    # Past the combinations: numbered variants ("... Premium 7")
+    for i in range(len(names), size):
+        brand, item, pack = combos[i % len(combos)]
+        names.append(f"{brand} {item} Premium {i // len(combos)} {pack}")
+    return {f"p{i}": name for i, name in enumerate(names)}
+
+
+def noisy_line(name: str, rng: random.Random) -> str:
+    """What a handwritten line might come back as from Tesseract."""
+    words = name.split()
+    if len(words) > 2 and rng.random() < 0.3:
+        words = words[1:]  # Customers often skip the brand
+    text = " ".join(words)
+    if rng.random() < 0.5:
+        text = text.lower()
+    chars = list(text)
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(chars))
+        chars[i] = OCR_CONFUSIONS.get(chars[i].lower(), "")
+    prefix = rng.choice(["", "", "2 x ", "1 ", "- "])
+    return prefix + "".join(chars)
+
+
+def full_scan(lines, products):
+    """The previous match_products loop, without the database."""
+    lowered = [(pid, name.lower()) for pid, name in products.items()]
+    results = []
+    for line in lines:
+        line_lower = line.lower()
+        best_id, best_score = None, 0.0
+        for pid, name_lower in lowered:
+            score = score_match(line_lower, name_lower)
+            if score > best_score:
+                best_id, best_score = pid, score
+        if best_id is not None and best_score > MATCH_THRESHOLD:
+            results.append({"product_id": best_id, "confidence": round(best_score, 2)})
+        else:
+            results.append({"product_id": None, "confidence": 0.0})
+    return results
+
+
+def run(catalog_size: int, line_count: int, candidates: int, seed: int):
+    rng = random.Random(seed)
+    products = build_catalog(catalog_size, rng)
+    truth = rng.sample(list(products), line_count)
+    lines = [noisy_line(products[pid], rng) for pid in truth]
+
+    start = time.perf_counter()
+    index = ProductIndex()
+    for pid, name in products.items():
+        index.add(pid, name)
+    build_seconds = time.perf_counter() - start
+    print(f"📦 {len(products)} products, {line_count} noisy lines, {candidates} candidates per line")
+    print(f"🔎 Index built in {build_seconds:.2f}s\n")
+
+    start = time.perf_counter()
+    scanned = full_scan(lines, products)
+    scan_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = match_lines(lines, index, candidates)
+    index_seconds = time.perf_counter() - start
+
+    def accuracy(results):
+        return sum(r["product_id"] == pid for r, pid in zip(results, truth)) / line_count
+
+    # The index never does worse if its best score is at least the full scan's
+    # (an equal score on a different product is a tie the full scan broke by catalog order)
+    not_worse = sum(i["confidence"] >= s["confidence"] for i, s in zip(indexed, scanned)) / line_count
+    same_product = sum(i["product_id"] == s["product_id"] for i, s in zip(indexed, scanned)) / line_count
+
+    print(f"{'':<10} {'ms/line':>10} {'accuracy':>9}")
+    print(f"{'full scan':<10} {scan_seconds / line_count * 1000:>10.1f} {accuracy(scanned):>9.1%}")
+    print(f"{'index':<10} {index_seconds / line_count * 1000:>10.2f} {accuracy(indexed):>9.1%}")
+    print(f"\n⚡ Speedup: {scan_seconds / index_seconds:.0f}x")
+    print(f"✅ Index score ≥ full scan on {not_worse:.1%} of lines (same product on {same_product:.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the trigram product index against the full scan.")
+    parser.add_argument("--catalog", type=int, default=100000)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--candidates", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    run(args.catalog, args.lines, args.candidates, args.seed)
@@ -0,0 +1,86 @@
+import os
+import random
+import argparse
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# ==========================================
+# FAKE FCM SERVER (local development & testing)
+# ==========================================
+# Speaks just enough of the FCM HTTP v1 API for app/services/push_service.py:
+#   POST /v1/projects/{project}/messages:send
+#     - tokens starting with "invalid" → 404 UNREGISTERED (dispatcher prunes them)
+#     - FAKE_FCM_FAILURE_RATE of requests → 503 with Retry-After (dispatcher retries)
+#     - anything else → 200 {"name": "projects/.../messages/<n>"}
+#   GET /_stats → counts of what was received, for asserting in tests
+#
+# Usage:
+#   python -m app.scripts.fake_fcm_server --port 9099 --failure-rate 0.1
+#   FCM_ENABLED=true FCM_ENDPOINT=http://127.0.0.1:9099 uvicorn app.main:app
+# ==========================================
+
+app = FastAPI(title="Fake FCM")
+stats = Counter()
+delivered = []
+
+
+@app.post("/v1/projects/{project_id}/messages:send")
+async def send_message(project_id: str, request: Request):
+    payload = await request.json()
+    message = payload.get("message", {})
+    token = message.get("token", "")
+    stats["received"] += 1
+
+    if random.random() < float(os.getenv("FAKE_FCM_FAILURE_RATE", "0")):
+        stats["unavailable"] += 1
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "0"},
+            content={"error": {"code": 503, "status": "UNAVAILABLE", "message": "The service is currently unavailable."}},
+        )
+
+    if token.startswith("invalid"):
+        stats["unregistered"] += 1
+        return JSONResponse(
+            status_code=404,
+            content={"error": {
+                "code": 404,
+                "status": "NOT_FOUND",
+                "message": "Requested entity was not found.",
+                "details": [{
+                    "@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError",
+                    "errorCode": "UNREGISTERED",
+                }],
+            }},
+        )
+
+    stats["delivered"] += 1
+    delivered.append(message)
+    return {"name": f"projects/{project_id}/messages/{stats['delivered']}"}
+
+
+@app.get("/_stats")
+def get_stats():
+    return {**stats, "last": delivered[-10:]}
+
+
+@app.delete("/_stats")
+def reset_stats():
+    stats.clear()
+    delivered.clear()
+    return {"success": True}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local fake FCM HTTP v1 server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9099)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    os.environ["FAKE_FCM_FAILURE_RATE"] = str(args.failure_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,142 @@
+import os
+import sys
+import gc
+import random
+import asyncio
+import argparse
+import tracemalloc
+
+from fastapi import WebSocketDisconnect
+
+# Add the project root to the python path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.ws_manager import PING_TEXT, PONG_TEXT, manager
+from app.api.ws import handle_websocket
+
+# ==========================================
+# WEBSOCKET HEARTBEAT SOAK TEST
+# ==========================================
+# Runs the real `handle_websocket` handler and ConnectionManager against N
+# in-process fake sockets (no network). Every second a share of the clients
+# vanish without a close frame (half-open — their pongs stop arriving) or
+# disconnect cleanly, and new clients connect to keep N online.
+#
+# With heartbeats + reaping, tracked connections and memory stay flat.
+# With --no-reaper, every half-open socket (and its handler + writer task)
+# leaks, exactly like before.
+#
+# Usage (no database needed):
+#   python -m app.scripts.soak_ws_heartbeat --connections 50000 --seconds 60
+#   python -m app.scripts.soak_ws_heartbeat --connections 50000 --seconds 60 --no-reaper
+# ==========================================
+
+
+class FakeSocket:
+    """Just enough of starlette's WebSocket for handle_websocket / ConnectionManager."""
+
+    def __init__(self):
+        self.scope = {"subprotocols": []}
+        self.query_params = {}
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.half_open = False
+        self.closed = False
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def receive_text(self) -> str:
+        text = await self.inbox.get()
+        if text is None:
+            raise WebSocketDisconnect(1001)
+        return text
+
+    async def send_text(self, text: str):
+        if self.closed:
+            raise RuntimeError("socket closed")
+        if self.half_open:
+            return  # Bytes vanish into a dead NAT mapping
+        if text == PING_TEXT:
+            self.inbox.put_nowait(PONG_TEXT)
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+        # The server tears the transport down → the handler's receive fails
+        self.inbox.put_nowait(None)
+
+
+async def run(connections: int, seconds: int, drop_rate: float, ping_interval: int, reaper: bool):
+    # Shortened timings so a one-minute run covers many ping / reap cycles
+    settings.WS_PING_INTERVAL_SECONDS = ping_interval
+    settings.WS_PONG_TIMEOUT_SECONDS = ping_interval
+    settings.WS_IDLE_TIMEOUT_SECONDS = ping_interval * 6
+    settings.WS_REAPER_INTERVAL_SECONDS = 1
+    if not reaper:
+        settings.WS_REAPER_INTERVAL_SECONDS = 10 ** 9
+
+    random.seed(42)
+    await manager.start()
+
+    live = {}  # { user_id: FakeSocket } — clients that still think they're online
+    handlers = set()
+    next_id = 0
+
+    def open_client():
+        nonlocal next_id
+        user_id = f"soak-{next_id}"
+        next_id += 1
+        socket = FakeSocket()
+        live[user_id] = socket
+        task = asyncio.create_task(handle_websocket(socket, user_id))
+        handlers.add(task)
+        task.add_done_callback(handlers.discard)
+
+    # Trace from the first connection, so replaced sockets are counted as freed
+    tracemalloc.start()
+    for _ in range(connections):
+        open_client()
+    await asyncio.sleep(0)
+
+    gc.collect()
+    baseline = tracemalloc.get_traced_memory()[0]
+    print(f"🔌 {connections} fake connections, {drop_rate:.0%} dropped per second, reaper {'ON' if reaper else 'OFF'}\n")
+    print(f"{'sec':>4} {'online':>7} {'tracked':>8} {'handlers':>9} {'reaped':>7} {'memory':>10}")
+
+    for second in range(1, seconds + 1):
+        # Network weather: some clients vanish silently, some say goodbye
+        for user_id in random.sample(list(live), int(len(live) * drop_rate)):
+            socket = live.pop(user_id)
+            if random.random() < 0.7:
+                socket.half_open = True
+            else:
+                socket.inbox.put_nowait(None)
+        while len(live) < connections:
+            open_client()
+
+        await asyncio.sleep(1)
+        gc.collect()
+        growth = (tracemalloc.get_traced_memory()[0] - baseline) / 1024 / 1024
+        tracked = len(manager.all_connections())
+        print(f"{second:>4} {len(live):>7} {tracked:>8} {len(handlers):>9} {manager.metrics.reaped:>7} {growth:>+8.1f}MB")
+
+    tracemalloc.stop()
+    for socket in live.values():
+        socket.inbox.put_nowait(None)
+    for task in list(handlers):
+        task.cancel()
+    await asyncio.gather(*handlers, return_exceptions=True)
+    await asyncio.sleep(0.1)  # Let the cancelled writer tasks finish
+    await manager.stop()
+    print("\n🎉 Done. With the reaper on, 'tracked' and memory should level off near the online count.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak-test WebSocket heartbeats and idle reaping.")
+    parser.add_argument("--connections", type=int, default=50000)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--drop-rate", type=float, default=0.02, help="Share of clients lost per second")
+    parser.add_argument("--ping-interval", type=int, default=5, help="Seconds (pong deadline = same)")
+    parser.add_argument("--no-reaper", action="store_true", help="Baseline: never ping or reap")
+    args = parser.parse_args()
+    asyncio.run(run(args.connections, args.seconds, args.drop_rate, args.ping_interval, not args.no_reaper))
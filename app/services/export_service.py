@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+from typing import Iterator, List
+
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+# Supported formats → response media type
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def stream_export(stmt: Select, columns: List[str], export_format: str) -> Iterator[str]:
+    """
+    Stream the rows of `stmt` as CSV or NDJSON text chunks.
+
+    - The query runs on a server-side cursor (`yield_per`), so only one batch of
+      rows is in memory at a time no matter how big the shop is.
+    - `stmt` should select plain columns, not ORM entities, so no objects are built.
+    - Uses its own session: the generator outlives the request's `get_db` session.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=settings.EXPORT_YIELD_PER))
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for batch in result.partitions():
+                writer.writerows(batch)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            # Empty export: still send the header row
+            if buffer.getvalue():
+                yield buffer.getvalue()
+        else:
+            for batch in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(columns, row)), default=str) + "\n"
+                    for row in batch
+                )
+    finally:
+        db.close()
@@ -0,0 +1,125 @@
+import asyncio
+import heapq
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.stock_service import load_pending_holds, release_expired_holds
+
+
+class HoldExpirySweeper:
+    """
+    Releases lapsed cart holds without polling the table every second.
+
+    A min-heap of (expires_at, hold_id) tells the sweeper exactly when the next
+    hold lapses, so it sleeps until then. When it wakes it releases every lapsed
+    hold in bulk straight from the `stock_holds` table — the table is the source
+    of truth, the heap only decides when to look. Holds consumed at checkout
+    just leave a stale heap entry behind, which costs one empty sweep.
+
+    It also sweeps at least every CART_HOLD_SWEEP_MAX_SLEEP_SECONDS as a
+    backstop for holds created by other worker processes.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, str]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Rebuild the heap from the table and start the background loop."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._heap = await asyncio.to_thread(self._load_pending)
+        heapq.heapify(self._heap)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, hold_id: str, expires_at: datetime):
+        """
+        Register a new hold. Safe to call from sync endpoints running in the
+        threadpool — the heap is only ever touched on the event loop thread.
+        """
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._push, expires_at, str(hold_id))
+
+    # ------------------------------------------
+    # Internals (event loop thread only)
+    # ------------------------------------------
+    def _push(self, expires_at: datetime, hold_id: str):
+        is_new_earliest = not self._heap or expires_at < self._heap[0][0]
+        heapq.heappush(self._heap, (expires_at, hold_id))
+        if is_new_earliest:
+            # Wake the loop so it re-computes how long to sleep
+            self._wakeup.set()
+
+    def _seconds_until_next(self) -> float:
+        delay = float(settings.CART_HOLD_SWEEP_MAX_SLEEP_SECONDS)
+        if self._heap:
+            until_next = (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds()
+            delay = min(delay, until_next)
+        return delay
+
+    def _pop_due(self) -> int:
+        now = datetime.now(timezone.utc)
+        popped = 0
+        while self._heap and self._heap[0][0] <= now:
+            heapq.heappop(self._heap)
+            popped += 1
+        return popped
+
+    async def _run(self):
+        while True:
+            delay = self._seconds_until_next()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue  # An earlier hold was scheduled, re-compute the sleep
+                except asyncio.TimeoutError:
+                    pass
+
+            self._pop_due()
+            try:
+                released = await asyncio.to_thread(self._sweep)
+                if released:
+                    print(f"🧺 Released {released} expired cart hold(s)")
+            except Exception as e:
+                print(f"❌ Hold sweeper error: {e}")
+
+    @staticmethod
+    def _load_pending() -> List[Tuple[datetime, str]]:
+        db = SessionLocal()
+        try:
+            return load_pending_holds(db)
+        except Exception as e:
+            print(f"❌ Hold sweeper could not load pending holds: {e}")
+            return []
+        finally:
+            db.close()
+
+    @staticmethod
+    def _sweep() -> int:
+        db = SessionLocal()
+        try:
+            return release_expired_holds(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# Single global instance — started in app/main.py
+hold_sweeper = HoldExpirySweeper()
@@ -0,0 +1,125 @@
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.ws_manager import manager
+from app.db.session import SessionLocal
+
+
+# ==========================================
+# 1. TOPIC NAMES
+# ==========================================
+def order_topic(order_id) -> str:
+    return f"order:{order_id}"
+
+
+def shop_topic(shop_id) -> str:
+    return f"shop:{shop_id}"
+
+
+def inventory_topic(shop_id) -> str:
+    return f"shop:{shop_id}:inventory"
+
+
+def parse_topic(topic: str):
+    """("order", id) / ("shop", id) / ("inventory", id), or None if it isn't a known topic."""
+    parts = topic.split(":") if isinstance(topic, str) else []
+    try:
+        if len(parts) == 2 and parts[0] in ("order", "shop"):
+            return parts[0], UUID(parts[1])
+        if len(parts) == 3 and parts[0] == "shop" and parts[2] == "inventory":
+            return "inventory", UUID(parts[1])
+    except ValueError:
+        pass
+    return None
+
+
+# ==========================================
+# 2. WHO MAY SUBSCRIBE
+# ==========================================
+def can_subscribe(user_id: str, topic: str) -> bool:
+    """
+    - order:<id>            → the customer who placed it, or the shop's owner
+    - shop:<id>             → the shop's owner (orders dashboard)
+    - shop:<id>:inventory   → anyone (stock levels are already public on the shop page)
+    Admins may subscribe to anything. Runs in a worker thread (blocking DB calls).
+    """
+    from app.models.order import Order
+    from app.models.shop import Shop
+    from app.models.user import User
+
+    parsed = parse_topic(topic)
+    if parsed is None:
+        return False
+    kind, object_id = parsed
+    if kind == "inventory":
+        return True
+
+    try:
+        uid = UUID(str(user_id))
+    except ValueError:
+        return False
+
+    db = SessionLocal()
+    try:
+        if db.query(User.role).filter(User.id == uid).scalar() == "admin":
+            return True
+
+        if kind == "shop":
+            return db.query(Shop.owner_id).filter(Shop.id == object_id).scalar() == uid
+
+        order = (
+            db.query(Order.customer_id, Shop.owner_id)
+            .join(Shop, Shop.id == Order.shop_id)
+            .filter(Order.id == object_id)
+            .first()
+        )
+        return order is not None and uid in (order.customer_id, order.owner_id)
+    finally:
+        db.close()
+
+
+# ==========================================
+# 3. PUBLISH (only after the change is committed)
+# ==========================================
+def queue_inventory_update(db: Session, shop_id, inventory_id, product_id, stock: Optional[int]):
+    """
+    Park a stock change on the session; it goes out to `shop:<id>:inventory`
+    subscribers once the transaction commits (latest value per item wins).
+    """
+    db.info.setdefault("inventory_updates", {})[str(inventory_id)] = {
+        "shop_id": str(shop_id),
+        "inventory_id": str(inventory_id),
+        "product_id": str(product_id),
+        "stock": stock,
+    }
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_inventory_updates(session: Session):
+    updates = session.info.pop("inventory_updates", None)
+    if updates:
+        for update in updates.values():
+            manager.publish_threadsafe(inventory_topic(update["shop_id"]), {"type": "inventory_update", **update})
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_inventory_updates(session: Session):
+    session.info.pop("inventory_updates", None)
+
+
+async def publish_order_event(order, event_type: str):
+    """Order changes go to the order's own topic (tracking screen) and the shop's (dashboard)."""
+    message = {
+        "type": event_type,
+        "order_id": str(order.id),
+        "shop_id": str(order.shop_id),
+        "status": order.status,
+        "order_type": order.order_type,
+        "total_amount": order.total_amount,
+        "estimated_preparation_minutes": order.estimated_preparation_minutes,
+    }
+    await manager.publish(order_topic(order.id), message)
+    await manager.publish(shop_topic(order.shop_id), message)
@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+
+# ==========================================
+# 1. DETECT THRESHOLD CROSSINGS (at the moment stock changes)
+# ==========================================
+def is_low(stock: Optional[int], reorder_level: Optional[int]) -> bool:
+    """An item is low once its stock is at or below its reorder level (None = no alerting)."""
+    return reorder_level is not None and stock is not None and stock <= reorder_level
+
+
+# `new_reorder_level` not given (stock-only changes) — None means the level was cleared
+_UNCHANGED = object()
+
+
+def note_stock_change(
+    db: Session,
+    inventory_item_id: UUID,
+    shop_id: UUID,
+    product_id: UUID,
+    old_stock: int,
+    new_stock: int,
+    old_reorder_level: Optional[int],
+    new_reorder_level=_UNCHANGED,
+):
+    """
+    Call wherever stock (or the reorder level) changes. If the item just went
+    from OK to low, the crossing is parked on the session and only handed to
+    the digest once the transaction commits — a rolled-back checkout never alerts.
+    Pass `new_reorder_level` whenever the level may have changed (None = cleared).
+    """
+    if new_reorder_level is _UNCHANGED:
+        new_reorder_level = old_reorder_level
+
+    if is_low(old_stock, old_reorder_level) or not is_low(new_stock, new_reorder_level):
+        return
+
+    db.info.setdefault("low_stock_crossings", []).append({
+        "inventory_id": str(inventory_item_id),
+        "shop_id": str(shop_id),
+        "product_id": str(product_id),
+        "stock": new_stock,
+        "reorder_level": new_reorder_level,
+    })
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_crossings(session: Session):
+    crossings = session.info.pop("low_stock_crossings", None)
+    if crossings:
+        low_stock_digest.record(crossings)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_crossings(session: Session):
+    session.info.pop("low_stock_crossings", None)
+
+
+# ==========================================
+# 2. DEBOUNCE INTO ONE DIGEST PER SHOP
+# ==========================================
+class LowStockDigest:
+    """
+    Collects low-stock crossings per shop and sends ONE notification per shop
+    per LOW_STOCK_DIGEST_WINDOW_SECONDS instead of one push per SKU.
+
+    `record()` is called from sync endpoints in the threadpool, so the pending
+    state is guarded by a plain threading lock; the flush runs on the event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # { shop_id: { inventory_id: crossing } } — latest crossing per item wins
+        self._pending: Dict[str, Dict[str, dict]] = {}
+        # { shop_id: monotonic time the digest is due }
+        self._due: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, crossings):
+        now = time.monotonic()
+        with self._lock:
+            for crossing in crossings:
+                shop_id = crossing["shop_id"]
+                self._pending.setdefault(shop_id, {})[crossing["inventory_id"]] = crossing
+                # The window opens on the first crossing; later ones ride along
+                self._due.setdefault(shop_id, now + settings.LOW_STOCK_DIGEST_WINDOW_SECONDS)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Don't drop alerts that were waiting for their window on shutdown
+        await self._flush(self._take_due(force=True))
+
+    def _take_due(self, force: bool = False) -> Dict[str, list]:
+        now = time.monotonic()
+        with self._lock:
+            due_shops = [shop_id for shop_id, due in self._due.items() if force or due <= now]
+            batch = {}
+            for shop_id in due_shops:
+                del self._due[shop_id]
+                batch[shop_id] = list(self._pending.pop(shop_id, {}).values())
+            return batch
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(1)
+            try:
+                await self._flush(self._take_due())
+            except Exception as e:
+                print(f"❌ Low-stock digest error: {e}")
+
+    async def _flush(self, batch: Dict[str, list]):
+        if not batch:
+            return
+
+        from app.models.product import Product
+        from app.models.shop import Shop
+        from app.services.notification_service import send_notification
+
+        db = SessionLocal()
+        try:
+            # One query for the owners, one for the product names
+            owners = dict(
+                db.query(Shop.id, Shop.owner_id)
+                .filter(Shop.id.in_([UUID(shop_id) for shop_id in batch]))
+                .all()
+            )
+            product_ids = {UUID(c["product_id"]) for items in batch.values() for c in items}
+            names = dict(
+                db.query(Product.id, Product.name)
+                .filter(Product.id.in_(product_ids))
+                .all()
+            )
+
+            for shop_id, items in batch.items():
+                owner_id = owners.get(UUID(shop_id))
+                if not owner_id:
+                    continue
+
+                for item in items:
+                    item["product_name"] = names.get(UUID(item["product_id"]), "Unknown product")
+                items.sort(key=lambda i: i["stock"])
+
+                summary = ", ".join(f"{i['product_name']} ({i['stock']} left)" for i in items[:5])
+                if len(items) > 5:
+                    summary += f" and {len(items) - 5} more"
+
+                await send_notification(
+                    user_id=str(owner_id),
+                    title=f"⚠️ Low Stock: {len(items)} item(s)",
+                    body=f"Time to reorder: {summary}",
+                    notification_type="low_stock",
+                    data={
+                        "shop_id": shop_id,
+                        "items": items,
+                    },
+                    db=db,
+                )
+        finally:
+            db.close()
+
+
+# Single global instance — started in app/main.py
+low_stock_digest = LowStockDigest()
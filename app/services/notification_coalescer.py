@@ -0,0 +1,141 @@
+import asyncio
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.notification_service import (
+    deliver_notification,
+    persist_notification,
+    send_notification,
+)
+from app.services.unread_counter import unread_counter
+
+
+class NotificationCoalescer:
+    """
+    Merges rapid-fire updates about the same thing (e.g. one order going
+    confirmed → preparing → ready in a few seconds) into ONE delivered
+    notification per (user, key).
+
+    The first update opens a NOTIFICATION_COALESCE_WINDOW_MS window; updates
+    arriving inside it replace the pending one (latest wins). When the window
+    closes, only the latest is sent over the WebSocket / FCM.
+
+    What gets stored depends on NOTIFICATION_COALESCE_PERSIST:
+    - "all" (default): every update is written immediately, so the history
+      stays complete; superseded rows are marked read when the window closes
+      so the unread badge only counts the one the user actually received
+    - "delivered": only the notification that gets delivered is written
+
+    Windows live in this worker's memory — fine, because every update for an
+    order comes through the merchant's PATCH on whichever worker handles it,
+    and the worst case across workers is simply no coalescing.
+    """
+
+    def __init__(self):
+        # { (user_id, key): pending update }
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        # Flushes started by the window timers — referenced so they aren't GC'd, awaited on shutdown
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(
+        self,
+        user_id: str,
+        key: str,
+        title: str,
+        body: str,
+        notification_type: str,
+        data: dict,
+        db,
+    ):
+        window = settings.NOTIFICATION_COALESCE_WINDOW_MS / 1000
+        if window <= 0:
+            await send_notification(user_id, title, body, notification_type, data, db)
+            return
+
+        notification_id = None
+        if settings.NOTIFICATION_COALESCE_PERSIST == "all":
+            notification, _ = persist_notification(user_id, title, body, notification_type, data, db)
+            notification_id = notification.id
+
+        pending_key = (user_id, key)
+        entry = self._pending.get(pending_key)
+        if entry is None:
+            entry = {"notification_ids": [], "merged": 0}
+            self._pending[pending_key] = entry
+            asyncio.get_running_loop().call_later(window, self._schedule_flush, pending_key)
+
+        entry.update(title=title, body=body, notification_type=notification_type, data=data)
+        entry["merged"] += 1
+        if notification_id is not None:
+            entry["notification_ids"].append(notification_id)
+
+    def _schedule_flush(self, pending_key):
+        task = asyncio.get_running_loop().create_task(self._flush(pending_key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush_all(self):
+        """Deliver everything still waiting, and finish flushes already under way (called on shutdown)."""
+        for pending_key in list(self._pending):
+            await self._flush(pending_key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _flush(self, pending_key):
+        entry = self._pending.pop(pending_key, None)
+        if entry is None:
+            return
+
+        user_id, _ = pending_key
+        data = {**entry["data"], "coalesced_updates": entry["merged"]} if entry["merged"] > 1 else entry["data"]
+
+        db = SessionLocal()
+        try:
+            if settings.NOTIFICATION_COALESCE_PERSIST != "all":
+                await send_notification(user_id, entry["title"], entry["body"], entry["notification_type"], data, db)
+                return
+
+            from app.models.notification import Notification
+
+            *superseded, latest_id = entry["notification_ids"]
+            counts = self._supersede(db, superseded)
+            latest = db.query(Notification).filter(Notification.id == latest_id).first()
+            if latest is None:  # Already archived / deleted
+                return
+            latest.data = data
+            db.commit()
+            unread_counter.remember(counts)
+
+            unread_count = counts.get(str(latest.user_id))
+            if unread_count is None:
+                unread_count = unread_counter.get(db, latest.user_id)
+            await deliver_notification(user_id, latest, unread_count, db)
+        except Exception as e:
+            print(f"❌ Notification coalescing error for {pending_key}: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _supersede(db, notification_ids: List) -> Dict[str, int]:
+        """Mark the superseded rows read (if the user hasn't already) and fix the badge."""
+        if not notification_ids:
+            return {}
+
+        from app.models.notification import Notification
+
+        flipped = db.execute(
+            update(Notification.__table__)
+            .where(Notification.id.in_(notification_ids), Notification.is_read.is_(False))
+            .values(is_read=True)
+            .returning(Notification.user_id)
+        ).all()
+        if not flipped:
+            return {}
+        return unread_counter.decrement(db, flipped[0].user_id, len(flipped))
+
+
+# Single global instance — flushed on shutdown in app/main.py
+notification_coalescer = NotificationCoalescer()
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.notification import Notification, NotificationArchive
+
+# Columns copied from the hot table into the archive
+_ARCHIVED_COLUMNS = ["id", "user_id", "title", "body", "type", "data", "is_read", "created_at"]
+
+
+def apply_notification_retention(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    mode: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> int:
+    """
+    Move (mode="archive") or drop (mode="delete") READ notifications older than
+    `older_than_days`, one batch per statement:
+
+        WITH moved AS (DELETE FROM notifications WHERE id IN (<oldest read rows, SKIP LOCKED>) RETURNING *)
+        INSERT INTO notifications_archive (...) SELECT ... FROM moved
+
+    Unread notifications are never touched, so unread counters stay correct.
+    Each batch commits on its own to keep locks and WAL bursts small.
+    Returns the number of notifications removed from the hot table.
+    """
+    older_than_days = older_than_days if older_than_days is not None else settings.NOTIFICATION_RETENTION_DAYS
+    mode = mode or settings.NOTIFICATION_RETENTION_MODE
+    batch_size = batch_size or settings.NOTIFICATION_RETENTION_BATCH
+
+    if mode not in ("archive", "delete"):
+        raise ValueError(f"Unknown retention mode '{mode}'. Must be 'archive' or 'delete'.")
+
+    hot = Notification.__table__
+    archive = NotificationArchive.__table__
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+    # Oldest first, so an interrupted run still frees the coldest rows
+    expired = (
+        select(hot.c.id)
+        .where(hot.c.is_read == True, hot.c.created_at < cutoff)
+        .order_by(hot.c.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    removed = delete(hot).where(hot.c.id.in_(expired.scalar_subquery()))
+
+    if mode == "archive":
+        moved = removed.returning(*[hot.c[name] for name in _ARCHIVED_COLUMNS]).cte("moved")
+        stmt = (
+            insert(archive)
+            .from_select(_ARCHIVED_COLUMNS, select(*[moved.c[name] for name in _ARCHIVED_COLUMNS]))
+            .add_cte(moved)
+        )
+    else:
+        stmt = removed
+
+    total = 0
+    batches = 0
+    while True:
+        count = db.execute(stmt).rowcount
+        db.commit()
+        total += count
+        batches += 1
+        if count < batch_size or (max_batches and batches >= max_batches):
+            return total
@@ -1,9 +1,36 @@
+import asyncio
+from typing import Iterable, List
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from uuid import UUID
-from app.core.ws_manager import manager
+from app.core.ws_manager import encode, manager
+from app.services.push_service import push_dispatcher
+from app.services.unread_counter import unread_counter
 
 
-async def send_notification(
+def _parse_user_id(user_id):
+    if isinstance(user_id, str):
+        # Explicit UUID cast prevents SQLAlchemy CompileError (f405) in Postgres inserts
+        try:
+            return UUID(user_id)
+        except ValueError:
+            return user_id
+    return user_id
+
+
+def _push(user, title: str, body: str, notification_type: str, notification_id, data: dict):
+    """Hand an offline user's push to the FCM dispatcher (or just log it when FCM is disabled)."""
+    if not user or not user.fcm_token:
+        print(f"[FCM] User {user.id if user else 'unknown'} is offline and has no FCM token registered.")
+        return
+
+    push_data = {"type": notification_type, "notification_id": str(notification_id), **data}
+    if not push_dispatcher.enqueue(user.fcm_token, title, body, push_data):
+        print(f"[FCM STUB] Sending push to {user.full_name} (Token: {user.fcm_token})")
+        print(f"           Title: {title} | Body: {body}")
+
+
+def persist_notification(
     user_id: str,
     title: str,
     body: str,
@@ -12,22 +39,11 @@ async def send_notification(
     db: Session,
 ):
     """
-    Central notification function:
-    1. Persist notification in the database
-    2. Push via WebSocket (real-time)
-    3. Extensible for FCM / WhatsApp later
+    Store one notification and bump the user's unread badge in the same commit.
+    Returns (notification, unread_count).
     """
+    parsed_user_id = _parse_user_id(user_id)
 
-    if isinstance(user_id, str):
-        # Explicit UUID cast prevents SQLAlchemy CompileError (f405) in Postgres inserts
-        try:
-            parsed_user_id = UUID(user_id)
-        except ValueError:
-            parsed_user_id = user_id
-    else:
-        parsed_user_id = user_id
-
-    # 1. Persist to DB
     from app.models.notification import Notification
     notification = Notification(
         user_id=parsed_user_id,
@@ -37,30 +53,132 @@ async def send_notification(
         data=data,
     )
     db.add(notification)
+    # Bump the unread badge in the same transaction as the insert
+    counts = unread_counter.increment(db, [parsed_user_id])
     db.commit()
     db.refresh(notification)
+    unread_counter.remember(counts)
+
+    return notification, counts.get(str(parsed_user_id))
 
-    # 2. Push via WebSocket (real-time in-app)
+
+async def deliver_notification(user_id: str, notification, unread_count, db: Session):
+    """
+    Push an already-stored notification: WebSocket if the user is online, else FCM.
+    It always goes through the manager, so a client that reconnects with
+    `last_event_id` can replay it either way.
+    """
     ws_payload = {
-        "type": notification_type,
+        "type": notification.type,
         "notification_id": str(notification.id),
-        "title": title,
-        "body": body,
-        **data,
+        "unread_count": unread_count,
+        "title": notification.title,
+        "body": notification.body,
+        **(notification.data or {}),
     }
-    
-    if manager.is_connected(user_id):
-        await manager.send_to_user(user_id, ws_payload)
-    else:
-        # 3. FCM Fallback (Stubbed for now)
+
+    online = manager.is_connected(user_id)
+    await manager.send_to_user(user_id, ws_payload)
+    if not online:
+        # FCM Fallback
         # We need the user's fcm_token from the database to send the push
         from app.models.user import User
         user = db.query(User).filter(User.id == user_id).first()
-        if user and user.fcm_token:
-            print(f"[FCM STUB] Sending push to {user.full_name} (Token: {user.fcm_token})")
-            print(f"           Title: {title} | Body: {body}")
-            # TODO: import firebase_admin and send native push using FCM SDK
-        else:
-            print(f"[FCM STUB] User {user_id} is offline and has no FCM token registered.")
+        _push(user, notification.title, notification.body, notification.type, notification.id, notification.data or {})
+
+
+async def send_notification(
+    user_id: str,
+    title: str,
+    body: str,
+    notification_type: str,
+    data: dict,
+    db: Session,
+):
+    """
+    Central notification function:
+    1. Persist notification in the database
+    2. Push via WebSocket (real-time)
+    3. Offline users get a native push (queued — never sent on the request path)
+    """
+
+    # 1. Persist to DB
+    notification, unread_count = persist_notification(user_id, title, body, notification_type, data, db)
+
+    # 2 + 3. Push via WebSocket (real-time in-app), FCM fallback
+    await deliver_notification(user_id, notification, unread_count, db)
 
     return notification
+
+
+async def send_notifications_bulk(
+    recipients: Iterable,
+    title: str,
+    body: str,
+    notification_type: str,
+    data: dict,
+    db: Session,
+) -> List[UUID]:
+    """
+    Same notification to many users (all admins, all customers of a shop...)
+    without N sequential transactions:
+    1. One multi-row INSERT ... RETURNING id (+ one unread-counter upsert), one commit
+    2. The shared payload is JSON-encoded once; only notification_id / unread_count differ per user
+    3. WebSocket sends to every user run concurrently (and land in their replay buffers)
+    4. Offline users' FCM tokens are fetched in one query
+
+    Returns the new notification IDs (in recipient order).
+    """
+    from app.models.notification import Notification
+    from app.models.user import User
+
+    # De-duplicate while keeping order — one notification per user
+    user_ids = list(dict.fromkeys(_parse_user_id(r) for r in recipients))
+    if not user_ids:
+        return []
+
+    # 1. Persist to DB — one statement, one commit
+    rows = [
+        {
+            "user_id": uid,
+            "title": title,
+            "body": body,
+            "type": notification_type,
+            "data": data,
+        }
+        for uid in user_ids
+    ]
+    stmt = insert(Notification.__table__).returning(
+        Notification.id, Notification.user_id, sort_by_parameter_order=True
+    )
+    inserted = db.execute(stmt, rows).all()
+    counts = unread_counter.increment(db, user_ids)
+    db.commit()
+    unread_counter.remember(counts)
+
+    # 2. Serialize the shared part of the payload once: '"type":...,"title":...,...}'
+    shared = encode({"type": notification_type, "title": title, "body": body, **data})
+    shared_tail = shared[1:]
+
+    payloads, offline = [], []
+    for notification_id, uid in inserted:
+        head = f'{{"notification_id":"{notification_id}","unread_count":{counts.get(str(uid), 0)},'
+        payloads.append((str(uid), head + shared_tail))
+        if not manager.is_connected(str(uid)):
+            offline.append(uid)
+
+    # 3. Fan out concurrently (offline users' copies are only buffered for replay)
+    await asyncio.gather(*(manager.send_text_to_user(uid, text) for uid, text in payloads))
+
+    # 4. FCM Fallback — one query for every offline user's token
+    if offline:
+        ids_by_user = {uid: notification_id for notification_id, uid in inserted}
+        users = (
+            db.query(User.id, User.full_name, User.fcm_token)
+            .filter(User.id.in_(offline))
+            .all()
+        )
+        for user in users:
+            _push(user, title, body, notification_type, ids_by_user.get(user.id), data)
+
+    return [notification_id for notification_id, _ in inserted]
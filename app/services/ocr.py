@@ -1,19 +1,26 @@
 import os
 import re
-from difflib import SequenceMatcher
+from concurrent.futures import Executor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Dict, Optional
 
 import pytesseract
 from PIL import Image
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.db.session import SessionLocal
-from app.models.product import Product
 from app.models.order import Order
 from app.models.cart_suggestion import CartSuggestion
+from app.models.ocr_job import OcrJob
 from app.models.shop import Shop
 from app.core.ws_manager import manager
-import asyncio
+from app.services.live_updates import order_topic, shop_topic
+from app.services.ocr_cache import ImageFingerprint, image_fingerprint, lookup_ocr_cache, store_ocr_cache
+from app.services.ocr_preprocess import preprocess_image, tesseract_config
+from app.services.notification_service import send_notification
+from app.services.product_matcher import catalog_index, match_shop_lines
 
 
 # ==========================================
@@ -21,15 +28,25 @@ import asyncio
 # ==========================================
 def extract_text_from_image(image_path: str) -> List[str]:
     """
-    Opens the image file and runs Tesseract OCR on it.
+    Opens the image file, preprocesses it (app/services/ocr_preprocess.py:
+    downscale, deskew, binarize, crop) and runs Tesseract OCR on it.
     Returns a cleaned list of non-empty text lines.
     """
-    img = Image.open(image_path)
-    
-    # Run Tesseract — returns raw text string
-    raw_text = pytesseract.image_to_string(img)
-    
-    # Clean up: split into lines, strip whitespace, remove empty lines
+    with Image.open(image_path) as img:
+        if settings.OCR_PREPROCESS:
+            img = preprocess_image(img)
+
+        # Run Tesseract — returns raw text string
+        raw_text = pytesseract.image_to_string(
+            img,
+            lang=settings.OCR_TESSERACT_LANG,
+            config=tesseract_config(settings.OCR_PREPROCESS),
+        )
+    return clean_ocr_lines(raw_text)
+
+
+def clean_ocr_lines(raw_text: str) -> List[str]:
+    """Tesseract's raw text → non-empty lines, dropping ones too short or with no letters."""
     lines = []
     for line in raw_text.split("\n"):
         cleaned = line.strip()
@@ -43,152 +60,278 @@ def extract_text_from_image(image_path: str) -> List[str]:
 # ==========================================
 # 2. FUZZY MATCH LINES TO PRODUCTS
 # ==========================================
-def match_products(extracted_lines: List[str], db: Session) -> List[Dict]:
+def match_products(extracted_lines: List[str], db: Session, shop_id=None) -> List[Dict]:
     """
     For each extracted text line, find the best matching product name
-    from the database using fuzzy string matching.
+    using a trigram index (app/services/product_matcher.py): a few dozen
+    candidates per line, then the exact fuzzy score.
+
+    With `shop_id`, lines are matched against that shop's inventory first;
+    only lines it has no match for fall back to the global catalog.
     
     Returns a list of dicts:
     [{ "extracted_text": "...", "product_id": 1, "product_name": "...", "confidence": 0.85 }]
     """
-    # Fetch all active products from the database
-    all_products = db.query(Product).filter(Product.is_active == True).all()
-    
-    if not all_products:
-        return [{"extracted_text": line, "product_id": None, "product_name": None, "confidence": 0.0} 
-                for line in extracted_lines]
-    
-    # Build a lookup: { lowercase_name: product }
-    product_map = {p.name.lower(): p for p in all_products}
-    product_names = list(product_map.keys())
-    
-    results = []
-    for line in extracted_lines:
-        line_lower = line.lower()
-        
-        best_match = None
-        best_score = 0.0
-        
-        # Compare this line against every product name
-        for pname in product_names:
-            # SequenceMatcher gives a ratio between 0.0 and 1.0
-            score = SequenceMatcher(None, line_lower, pname).ratio()
-            
-            # Also check if the line CONTAINS the product name (partial match)
-            if pname in line_lower or line_lower in pname:
-                score = max(score, 0.75)  # Boost partial matches
-            
-            if score > best_score:
-                best_score = score
-                best_match = pname
-        
-        # Only suggest if confidence is reasonable (> 40%)
-        if best_match and best_score > 0.4:
-            matched_product = product_map[best_match]
-            results.append({
-                "extracted_text": line,
-                "product_id": matched_product.id,
-                "product_name": matched_product.name,
-                "confidence": round(best_score, 2)
-            })
+    if shop_id is not None:
+        return match_shop_lines(extracted_lines, db, shop_id)
+    return catalog_index.match(db, extracted_lines)
+
+
+# ==========================================
+# 3. ALL IMAGES OF AN ORDER (parallel OCR + merge)
+# ==========================================
+def chitty_image_paths(order: Order) -> List[str]:
+    """
+    Local file paths of the order's uploaded chitty images, in upload order.
+    Only our own uploads ("/static/chitty_abc.jpg" → "uploads/chitty_abc.jpg") can be read.
+    """
+    paths = []
+    for url in order.list_image_urls or []:
+        if not isinstance(url, str) or not url.lstrip("/").startswith("static/"):
+            print(f"⚠️ OCR: skipping image that isn't one of our uploads: {url}")
+            continue
+
+        # Strip the '/static/' prefix and any leading slashes so os.path.join works correctly
+        image_filename = url.lstrip("/")[len("static/"):].lstrip("/")
+        image_path = os.path.join("uploads", image_filename)
+        if not os.path.exists(image_path):
+            print(f"❌ OCR Error: File not found at {image_path}")
+            continue
+        paths.append(image_path)
+    return paths
+
+
+def merge_lines(lines_per_image: List[List[str]]) -> List[str]:
+    """
+    One list of lines across all images, in image order, with duplicates removed
+    (same line ignoring case, spacing and punctuation — e.g. overlapping photos of one list).
+    """
+    seen = set()
+    merged = []
+    for lines in lines_per_image:
+        for line in lines:
+            key = " ".join(re.findall(r"[a-z0-9]+", line.lower()))
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(line)
+    return merged
+
+
+def _report_progress(db: Session, order: Order, job_id, images_done: int, images_total: int, lines_found: int):
+    """Store the job's progress and push it to the order's and shop's live topics."""
+    if job_id is not None:
+        db.query(OcrJob).filter(OcrJob.id == job_id).update(
+            {"images_done": images_done, "images_total": images_total}, synchronize_session=False
+        )
+        db.commit()
+
+    message = {
+        "type": "ocr_progress",
+        "order_id": str(order.id),
+        "images_done": images_done,
+        "images_total": images_total,
+        "lines_found": lines_found,
+    }
+    manager.publish_threadsafe(order_topic(order.id), message)
+    manager.publish_threadsafe(shop_topic(order.shop_id), message)
+
+
+def _fingerprint(image_path: str) -> Optional[ImageFingerprint]:
+    try:
+        return image_fingerprint(image_path)
+    except Exception as e:
+        print(f"⚠️ OCR cache: can't fingerprint {image_path}: {e}")  # Not an image we can read — OCR will say why
+        return None
+
+
+def _cached_lines(db: Session, fingerprint: Optional[ImageFingerprint], customer_id) -> Optional[List[str]]:
+    if fingerprint is None:
+        return None
+    try:
+        return lookup_ocr_cache(db, fingerprint, customer_id)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ OCR cache lookup failed: {e}")
+        return None
+
+
+def _cache_lines(db: Session, fingerprint: Optional[ImageFingerprint], lines: List[str], customer_id):
+    if fingerprint is None:
+        return
+    try:
+        store_ocr_cache(db, fingerprint, lines, customer_id)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ OCR cache store failed: {e}")
+
+
+def ocr_order_images(
+    db: Session,
+    order: Order,
+    image_paths: List[str],
+    ocr_pool: Optional[Executor] = None,
+    job_id=None,
+) -> List[str]:
+    """
+    OCR every image at once — each one is a separate task on `ocr_pool`, so
+    they run on as many cores as the pool has — and report each image as it
+    finishes. An unreadable image is skipped; if every image fails, the error
+    is raised so the job is retried.
+
+    Images already in the OCR cache (app/services/ocr_cache.py — same bytes,
+    or a near-duplicate of the customer's earlier upload) skip Tesseract;
+    fresh results are added to it.
+    """
+    total = len(image_paths)
+    lines_per_image: List[List[str]] = [[] for _ in image_paths]
+    errors = []
+
+    fingerprints: List[Optional[ImageFingerprint]] = [None] * total
+    to_ocr = []
+    for i, path in enumerate(image_paths):
+        if settings.OCR_CACHE_ENABLED:
+            fingerprints[i] = _fingerprint(path)
+        cached = _cached_lines(db, fingerprints[i], order.customer_id)
+        if cached is None:
+            to_ocr.append(i)
         else:
-            # No good match found — still record the line
-            results.append({
-                "extracted_text": line,
-                "product_id": None,
-                "product_name": None,
-                "confidence": 0.0
-            })
-    
-    return results
+            lines_per_image[i] = cached
+
+    done = total - len(to_ocr)
+    if done:
+        print(f"⚡ OCR cache: {done}/{total} image(s) of order {order.id} already read")
+    _report_progress(db, order, job_id, done, total, sum(len(lines) for lines in lines_per_image))
+
+    if ocr_pool is not None:
+        futures = {ocr_pool.submit(extract_text_from_image, image_paths[i]): i for i in to_ocr}
+        finished = ((futures[f], f.result) for f in as_completed(futures))
+    else:
+        finished = ((i, lambda path=image_paths[i]: extract_text_from_image(path)) for i in to_ocr)
+
+    for done, (index, result) in enumerate(finished, start=done + 1):
+        try:
+            lines_per_image[index] = result()
+        except BrokenProcessPool:
+            raise  # The pool itself is gone — the worker replaces it and retries the job
+        except Exception as e:
+            print(f"❌ OCR Error on {image_paths[index]}: {e}")
+            errors.append(e)
+        else:
+            _cache_lines(db, fingerprints[index], lines_per_image[index], order.customer_id)
+        _report_progress(db, order, job_id, done, total, sum(len(lines) for lines in lines_per_image))
+
+    if errors and len(errors) == total:
+        raise errors[0]
+    return merge_lines(lines_per_image)
 
 
 # ==========================================
-# 3. MAIN BACKGROUND TASK
+# 4. MAIN BACKGROUND TASK
 # ==========================================
-def process_chitty_order(order_id: int):
+async def _send_chitty_processed(owner_id, data: dict):
+    # Runs on the event loop, with its own session (the job's belongs to the worker thread)
+    db = SessionLocal()
+    try:
+        await send_notification(
+            user_id=str(owner_id),
+            title="📝 Chitty processed",
+            body=data["message"],
+            notification_type="chitty_processed",
+            data=data,
+            db=db,
+        )
+    finally:
+        db.close()
+
+
+def _notify_merchant(owner_id, data: dict):
+    """
+    Called from the job's worker thread: hands the notification to the main
+    event loop (the one the WebSocket manager and its sockets live on) and
+    waits for it. A failed notification is logged — the suggestions are
+    already saved, so the job isn't retried for it.
     """
-    Background task that:
-    1. Reads the uploaded chitty image
-    2. Extracts text via OCR
-    3. Matches text to products
+    future = manager.run_threadsafe(_send_chitty_processed(owner_id, data))
+    if future is None:
+        print(f"⚠️ OCR: no event loop running, chitty_processed for order {data['order_id']} not sent")
+        return
+    try:
+        future.result(timeout=settings.OCR_NOTIFY_TIMEOUT_SECONDS)
+    except Exception as e:
+        future.cancel()
+        print(f"❌ OCR: chitty_processed for order {data['order_id']} failed: {type(e).__name__}: {e}")
+
+
+def process_chitty_order(order_id: int, ocr_pool: Optional[Executor] = None, job_id=None):
+    """
+    One OCR job (run by app/services/ocr_worker.py in a worker thread):
+    1. Finds every uploaded chitty image of the order
+    2. Extracts text from all of them in parallel (in `ocr_pool`'s processes when given),
+       unless the OCR cache already has an image's lines
+    3. Matches the merged, de-duplicated lines to products
     4. Saves suggestions to the database
-    5. Notifies the shopkeeper via WebSocket
+    5. Notifies the shopkeeper (persisted notification, delivered on the main event loop)
+
+    Errors propagate so the job is retried; re-running a job replaces the
+    suggestions of the earlier attempt instead of duplicating them.
     """
     # Create a fresh DB session for this background task
     db = SessionLocal()
     
     try:
-        # 1. Get the order and its image path
+        # 1. Get the order and its image paths
         order = db.query(Order).filter(Order.id == order_id).first()
-        if not order or not order.list_image_url:
+        if not order or not order.list_image_urls:
             return
-        
-        # Convert the URL path ("/static/chitty_abc.jpg") to a file path ("uploads/chitty_abc.jpg")
-        # 1. Strip the '/static/' prefix
-        image_filename = order.list_image_url.replace("/static/", "")
-        
-        # 2. STRIP ANY LEADING SLASHES so os.path.join works correctly
-        image_filename = image_filename.lstrip("/") 
-        
-        # 3. Safely join the path
-        image_path = os.path.join("uploads", image_filename)
-        
-        # Add a quick debug print so you can see it working in your terminal!
-        print(f"🤖 OCR Starting: Reading image from {image_path}") 
-        
-        if not os.path.exists(image_path):
-            print(f"❌ OCR Error: File not found at {image_path}") # This helps immensely with debugging
+
+        image_paths = chitty_image_paths(order)
+        if not image_paths:
             return
-        
-        # 2. Extract text from the image
-        extracted_lines = extract_text_from_image(image_path)
+
+        # Add a quick debug print so you can see it working in your terminal!
+        print(f"🤖 OCR Starting: {len(image_paths)} image(s) for order {order_id}")
+
+        # 2. Extract text from every image (CPU-heavy → separate processes)
+        extracted_lines = ocr_order_images(db, order, image_paths, ocr_pool, job_id)
         
         if not extracted_lines:
             return
         
-        # 3. Match extracted lines to products
-        matches = match_products(extracted_lines, db)
+        # 3. Match extracted lines to the shop's products (catalog fallback)
+        matches = match_products(extracted_lines, db, order.shop_id)
         
-        # 4. Save each suggestion to the database
-        for match in matches:
-            suggestion = CartSuggestion(
-                order_id=order_id,
-                extracted_text=match["extracted_text"],
-                product_id=match["product_id"],
-                product_name=match["product_name"],
-                confidence=match["confidence"],
-                status="suggested"
-            )
-            db.add(suggestion)
+        # 4. Save the suggestions in one multi-row INSERT (replacing a failed attempt's)
+        db.query(CartSuggestion).filter(
+            CartSuggestion.order_id == order_id,
+            CartSuggestion.status == "suggested",
+        ).delete(synchronize_session=False)
+        if matches:
+            db.execute(insert(CartSuggestion.__table__), [
+                {
+                    "order_id": order_id,
+                    "extracted_text": match["extracted_text"],
+                    "product_id": match["product_id"],
+                    "product_name": match["product_name"],
+                    "confidence": match["confidence"],
+                    "status": "suggested",
+                }
+                for match in matches
+            ])
         
         db.commit()
         
-        # 5. Notify the shopkeeper via WebSocket!
+        # 5. Notify the shopkeeper (stored in their inbox + WebSocket / FCM)
         #    Find the shop owner's user_id to send the notification
         shop = db.query(Shop).filter(Shop.id == order.shop_id).first()
         if shop:
-            # Run the async WebSocket send from this sync background task
-            notification = {
-                "type": "chitty_processed",
-                "order_id": order_id,
-                "items_found": len([m for m in matches if m["product_id"] is not None]),
+            items_found = len([m for m in matches if m["product_id"] is not None])
+            _notify_merchant(shop.owner_id, {
+                "order_id": str(order_id),
+                "items_found": items_found,
                 "total_lines": len(matches),
-                "message": f"OCR complete! Found {len([m for m in matches if m['product_id']])} product matches from {len(matches)} lines."
-            }
-            
-            # Use asyncio to send via the WebSocket manager
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.ensure_future(manager.send_to_user(shop.owner_id, notification))
-                else:
-                    loop.run_until_complete(manager.send_to_user(shop.owner_id, notification))
-            except RuntimeError:
-                # If no event loop exists, create one
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(manager.send_to_user(shop.owner_id, notification))
+                "images": len(image_paths),
+                "message": f"OCR complete! Found {items_found} product matches from {len(matches)} lines."
+            })
     
     finally:
         db.close()
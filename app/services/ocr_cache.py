@@ -0,0 +1,150 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+from sqlalchemy import select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.ocr_cache import OcrCacheEntry
+from app.services.ocr_preprocess import tesseract_config
+
+# dHash grid: HASH_SIZE x HASH_SIZE gradient bits (16 → 256 bits)
+HASH_SIZE = 16
+# Ink levels closer than this count as equal (JPEG noise mustn't flip bits)
+INK_STEP = 2
+
+
+class ImageFingerprint(NamedTuple):
+    content_hash: str  # sha256 of the file bytes (hex)
+    dhash: str         # perceptual difference hash (hex)
+
+
+# ==========================================
+# 1. FINGERPRINTS
+# ==========================================
+def dhash(img: Image.Image) -> str:
+    """
+    Difference hash of where the writing is: the image's ink (darker than
+    its surroundings, so lighting and paper tone drop out) shrunk to
+    (HASH_SIZE + 1) x HASH_SIZE, recording per row whether each cell holds
+    more ink than its right neighbour. Blank cells tie and stay 0, so only
+    the text decides the bits; re-encoding, resizing or brightness changes
+    flip only a few.
+    """
+    img.draft("L", (HASH_SIZE * 16, HASH_SIZE * 16))  # JPEG: decode at reduced scale, plenty for this
+    gray = ImageOps.exif_transpose(img).convert("L")
+    gray.thumbnail((HASH_SIZE * 16, HASH_SIZE * 16))
+    ink = ImageChops.subtract(gray.filter(ImageFilter.BoxBlur(8)), gray)
+    small = ink.resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX).point(lambda v: v // INK_STEP)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def image_fingerprint(image_path: str) -> ImageFingerprint:
+    with open(image_path, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    with Image.open(image_path) as img:
+        return ImageFingerprint(content_hash, dhash(img))
+
+
+def ocr_config_key() -> str:
+    """Everything that changes Tesseract's output: a setting change means fresh OCR, not stale lines."""
+    preprocess = "prep" if settings.OCR_PREPROCESS else "raw"
+    if settings.OCR_PREPROCESS:
+        preprocess += f"@{settings.OCR_TARGET_DPI}x{settings.OCR_CHITTY_LONG_SIDE_INCHES}"
+    return f"{preprocess} {settings.OCR_TESSERACT_LANG} {tesseract_config(settings.OCR_PREPROCESS)}"
+
+
+# ==========================================
+# 2. LOOKUP / STORE (caller's session, commits)
+# ==========================================
+def _touch(db: Session, entry_id):
+    db.execute(
+        update(OcrCacheEntry.__table__)
+        .where(OcrCacheEntry.id == entry_id)
+        .values(hits=OcrCacheEntry.hits + 1, last_used_at=datetime.now(timezone.utc))
+    )
+    db.commit()
+
+
+def lookup_ocr_cache(db: Session, fingerprint: ImageFingerprint, customer_id=None) -> Optional[List[str]]:
+    """
+    Cached lines for this image, or None.
+    1. Exact: same bytes, same OCR settings (anyone's upload)
+    2. Near-duplicate: the customer's recently used entries within
+       OCR_CACHE_NEAR_DUPLICATE_BITS of the image's dHash (0 by default —
+       off, the distances overlap those of a list with one line changed)
+    """
+    config = ocr_config_key()
+    exact = db.execute(
+        select(OcrCacheEntry.id, OcrCacheEntry.lines).where(
+            OcrCacheEntry.content_hash == fingerprint.content_hash,
+            OcrCacheEntry.ocr_config == config,
+        )
+    ).first()
+    if exact:
+        _touch(db, exact.id)
+        return exact.lines
+
+    if customer_id is None or settings.OCR_CACHE_NEAR_DUPLICATE_BITS <= 0:
+        return None
+
+    recent = db.execute(
+        select(OcrCacheEntry.id, OcrCacheEntry.dhash, OcrCacheEntry.lines)
+        .where(OcrCacheEntry.customer_id == customer_id, OcrCacheEntry.ocr_config == config)
+        .order_by(OcrCacheEntry.last_used_at.desc())
+        .limit(settings.OCR_CACHE_NEAR_CANDIDATES)
+    ).all()
+    if not recent:
+        return None
+
+    best = min(recent, key=lambda entry: hamming(entry.dhash, fingerprint.dhash))
+    if hamming(best.dhash, fingerprint.dhash) > settings.OCR_CACHE_NEAR_DUPLICATE_BITS:
+        return None
+    _touch(db, best.id)
+    return best.lines
+
+
+# Everything older than the OCR_CACHE_MAX_ENTRIES-th most recently used entry
+EVICT_SQL = text("""
+    DELETE FROM ocr_cache_entries
+    WHERE last_used_at <= (
+        SELECT last_used_at FROM ocr_cache_entries
+        ORDER BY last_used_at DESC
+        OFFSET :keep LIMIT 1
+    )
+""")
+
+
+def store_ocr_cache(db: Session, fingerprint: ImageFingerprint, lines: List[str], customer_id=None):
+    """Save freshly OCR'd lines (upsert), then evict the least recently used entries past the size bound."""
+    table = OcrCacheEntry.__table__
+    now = datetime.now(timezone.utc)
+    stmt = pg_insert(table).values(
+        content_hash=fingerprint.content_hash,
+        ocr_config=ocr_config_key(),
+        dhash=fingerprint.dhash,
+        customer_id=customer_id,
+        lines=lines,
+        hits=0,
+        last_used_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.content_hash, table.c.ocr_config],
+        set_={"lines": stmt.excluded.lines, "last_used_at": now},
+    )
+    db.execute(stmt)
+    db.execute(EVICT_SQL, {"keep": settings.OCR_CACHE_MAX_ENTRIES})
+    db.commit()
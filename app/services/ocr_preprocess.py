@@ -0,0 +1,143 @@
+from typing import Tuple
+
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+
+from app.core.config import settings
+
+# Ink = darker than its neighbourhood's mean by more than this (0-255)
+BINARIZE_OFFSET = 12
+# Deskew search: coarse 1° steps up to ±MAX_SKEW_DEGREES, then 0.2° around the best.
+# Below MIN_SKEW_DEGREES the page is left alone (Tesseract copes, and the estimate is ±1°)
+MAX_SKEW_DEGREES = 10
+MIN_SKEW_DEGREES = 1.0
+# Deskew / crop decisions are made on a shrunken copy about this size (long side, px)
+ANALYSIS_SIZE = 400
+# In that copy, blocks with less ink than this (0-255) are noise, not writing
+SPECK_LEVEL = 40
+# White border kept around the cropped text (Tesseract misreads glyphs touching the edge)
+BORDER_PX = 20
+
+
+# ==========================================
+# 1. THE STEPS (pure Pillow, grayscale in → grayscale out)
+# ==========================================
+def target_long_side() -> int:
+    """Long side (px) of a chitty photographed edge to edge, at OCR_TARGET_DPI."""
+    return int(settings.OCR_TARGET_DPI * settings.OCR_CHITTY_LONG_SIDE_INCHES)
+
+
+def load_grayscale(img: Image.Image) -> Image.Image:
+    """
+    Upright, grayscale and no larger than the target DPI.
+
+    For JPEGs the downscale mostly happens while decoding (`draft`), so a
+    12-megapixel photo is never fully decompressed.
+    """
+    target = target_long_side()
+    scale = target / max(img.size)
+    if scale < 1:
+        img.draft("L", (int(img.width * scale), int(img.height * scale)))
+
+    img = ImageOps.exif_transpose(img).convert("L")
+
+    scale = target / max(img.size)
+    if scale < 1:
+        img = img.resize((round(img.width * scale), round(img.height * scale)), Image.LANCZOS)
+    return img
+
+
+def binarize(gray: Image.Image) -> Image.Image:
+    """
+    Adaptive (local mean) threshold: a pixel is ink when it is BINARIZE_OFFSET
+    darker than the average of its neighbourhood. Unlike one global threshold
+    it survives shadows and uneven phone-flash lighting across the page.
+    """
+    radius = max(8, max(gray.size) // 50)
+    local_mean = gray.filter(ImageFilter.BoxBlur(radius))
+    darkness = ImageChops.subtract(local_mean, gray)  # how much darker than the surroundings (clipped at 0)
+    return darkness.point([0 if v > BINARIZE_OFFSET else 255 for v in range(256)])
+
+
+def ink_density(binary: Image.Image) -> Image.Image:
+    """
+    A ~ANALYSIS_SIZE copy where each pixel is how much ink its block holds
+    (white = dense). Isolated specks average out and are dropped, so only
+    real strokes remain.
+    """
+    factor = max(1, max(binary.size) // ANALYSIS_SIZE)
+    small = ImageOps.invert(binary).reduce(factor)
+    return small.point([v if v > SPECK_LEVEL else 0 for v in range(256)])
+
+
+def _row_profile_score(ink: Image.Image, angle: float) -> float:
+    """How "striped" the rows are after rotating by `angle`: text lines aligned with rows → high."""
+    rotated = ink.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=0)
+    rows = rotated.resize((1, rotated.height), Image.BOX).tobytes()  # one byte (0-255) per row
+    return sum((a - b) ** 2 for a, b in zip(rows, rows[1:]))
+
+
+def skew_angle(binary: Image.Image) -> float:
+    """
+    Degrees to rotate the page (counter-clockwise, as `Image.rotate`) so its
+    lines run horizontally — the angle with the sharpest row projection profile.
+    """
+    # Pre-blurred, so every angle is compared equally smooth (rotating by 0° wouldn't interpolate)
+    ink = ink_density(binary).filter(ImageFilter.BoxBlur(1))
+
+    coarse = max(range(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES + 1), key=lambda a: _row_profile_score(ink, a))
+    fine = [coarse + step / 5 for step in range(-5, 6)]
+    return max(fine, key=lambda a: _row_profile_score(ink, a))
+
+
+def deskew(binary: Image.Image) -> Image.Image:
+    angle = skew_angle(binary)
+    if abs(angle) < MIN_SKEW_DEGREES:
+        return binary
+    rotated = binary.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    return rotated.point([0 if v < 128 else 255 for v in range(256)])
+
+
+def content_box(binary: Image.Image) -> Tuple[int, int, int, int]:
+    """
+    Bounding box of the text, one block of margin each side. Measured on
+    `ink_density`, with lone dots (noise bigger than a speck) filtered out.
+    """
+    factor = max(1, max(binary.size) // ANALYSIS_SIZE)
+    box = ink_density(binary).filter(ImageFilter.MedianFilter(3)).getbbox()
+    if box is None:
+        return (0, 0, binary.width, binary.height)
+    left, top, right, bottom = box
+    return (
+        max(0, (left - 1) * factor),
+        max(0, (top - 1) * factor),
+        min(binary.width, (right + 1) * factor),
+        min(binary.height, (bottom + 1) * factor),
+    )
+
+
+# ==========================================
+# 2. THE PIPELINE
+# ==========================================
+def preprocess_image(img: Image.Image) -> Image.Image:
+    """
+    Turn a phone photo of a chitty into what Tesseract reads best:
+    1. Upright (EXIF), grayscale, downscaled to OCR_TARGET_DPI
+    2. Binarized with a local threshold, specks removed
+    3. Deskewed (lines horizontal)
+    4. Cropped to the text, with a white border
+
+    Deskewing happens after binarizing, so the corners the rotation adds are
+    plain white rather than a hard edge against (possibly shadowed) paper.
+    """
+    binary = binarize(load_grayscale(img)).filter(ImageFilter.MedianFilter(3))
+    binary = deskew(binary)
+    binary = binary.crop(content_box(binary))
+    return ImageOps.expand(binary, border=BORDER_PX, fill=255)
+
+
+def tesseract_config(preprocessed: bool = True) -> str:
+    """Engine / page-segmentation flags; after preprocessing the DPI is known, so Tesseract needn't guess it."""
+    config = f"--oem {settings.OCR_TESSERACT_OEM} --psm {settings.OCR_TESSERACT_PSM}"
+    if preprocessed:
+        config += f" --dpi {settings.OCR_TARGET_DPI}"
+    return config
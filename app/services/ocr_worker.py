@@ -0,0 +1,333 @@
+import os
+import uuid
+import random
+import signal
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+
+from sqlalchemy import text, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.ocr_job import OcrJob
+from app.models.order import Order
+from app.services.ocr import process_chitty_order
+
+
+# ==========================================
+# 1. QUEUE OPERATIONS (plain DB calls, caller's session)
+# ==========================================
+def enqueue_ocr_job(db: Session, order_id) -> OcrJob:
+    """
+    Queue OCR for an order. Call it BEFORE the order's commit, so the job
+    exists exactly when the order does (no lost jobs on a crash or restart).
+    """
+    job = OcrJob(order_id=order_id, status="queued")
+    db.add(job)
+    db.query(Order).filter(Order.id == order_id).update({"ocr_status": "queued"}, synchronize_session=False)
+    return job
+
+
+# Due queued jobs, plus "running" jobs whose worker died (lease ran out) and have attempts left.
+# SKIP LOCKED: concurrent workers each get different rows and never wait on each other.
+CLAIM_SQL = text("""
+    WITH claimable AS (
+        SELECT id FROM ocr_jobs
+        WHERE (status = 'queued' AND run_after <= now())
+           OR (status = 'running' AND locked_at < now() - make_interval(secs => :lease)
+               AND attempts < :max_attempts)
+        ORDER BY run_after
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE ocr_jobs AS j
+    SET status = 'running', locked_by = :worker, locked_at = now(), attempts = j.attempts + 1
+    FROM claimable
+    WHERE j.id = claimable.id
+    RETURNING j.id, j.order_id, j.attempts
+""")
+
+
+# Orphaned jobs that already used every attempt (e.g. an image that kills its worker each time) → failed
+EXPIRE_SQL = text("""
+    WITH expired AS (
+        UPDATE ocr_jobs
+        SET status = 'failed', finished_at = now(), locked_by = NULL,
+            last_error = 'Lease expired on the last attempt (worker died or hung)'
+        WHERE status = 'running'
+          AND locked_at < now() - make_interval(secs => :lease)
+          AND attempts >= :max_attempts
+        RETURNING order_id
+    )
+    UPDATE orders SET ocr_status = 'failed'
+    FROM expired
+    WHERE orders.id = expired.order_id
+""")
+
+# Keeps a long job's lease alive — only while this worker still holds it
+RENEW_SQL = text("""
+    UPDATE ocr_jobs SET locked_at = now()
+    WHERE id = :job_id AND status = 'running' AND locked_by = :worker
+""")
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int) -> List:
+    """Atomically take up to `limit` jobs for this worker and mark their orders as processing."""
+    params = {"lease": settings.OCR_JOB_LEASE_SECONDS, "max_attempts": settings.OCR_JOB_MAX_ATTEMPTS}
+    db.execute(EXPIRE_SQL, params)
+    jobs = db.execute(CLAIM_SQL, {"worker": worker_id, "limit": limit, **params}).all()
+    if jobs:
+        db.execute(
+            update(Order.__table__)
+            .where(Order.id.in_([job.order_id for job in jobs]))
+            .values(ocr_status="processing")
+        )
+    db.commit()
+    return jobs
+
+
+def renew_lease(db: Session, job_id, worker_id: str) -> bool:
+    """Push the job's lease forward. False if it is no longer ours (lease lost and claimed by another worker)."""
+    renewed = db.execute(RENEW_SQL, {"job_id": job_id, "worker": worker_id}).rowcount
+    db.commit()
+    return bool(renewed)
+
+
+def _release_owned(db: Session, job_id, worker_id: str, **values) -> bool:
+    """Update the job only if this worker still holds it — a worker whose lease ran out must not overwrite the new owner."""
+    return bool(
+        db.execute(
+            update(OcrJob.__table__)
+            .where(OcrJob.id == job_id, OcrJob.status == "running", OcrJob.locked_by == worker_id)
+            .values(locked_by=None, **values)
+        ).rowcount
+    )
+
+
+def complete_job(db: Session, job_id, order_id, worker_id: str) -> bool:
+    """Mark the job done. False if another worker had taken it over (nothing is changed)."""
+    if not _release_owned(db, job_id, worker_id, status="done", finished_at=datetime.now(timezone.utc), last_error=None):
+        db.rollback()
+        return False
+    db.execute(update(Order.__table__).where(Order.id == order_id).values(ocr_status="done"))
+    db.commit()
+    return True
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: base, 2x base, 4x base ... (±20%)."""
+    delay = settings.OCR_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def fail_job(db: Session, job_id, order_id, attempts: int, error: str, worker_id: str) -> Optional[bool]:
+    """
+    Schedule a retry with backoff, or give up after OCR_JOB_MAX_ATTEMPTS. Returns True if it will retry,
+    None if another worker had taken the job over (nothing is changed).
+    """
+    will_retry = attempts < settings.OCR_JOB_MAX_ATTEMPTS
+    values = {"last_error": error[:2000]}
+    if will_retry:
+        values.update(status="queued", run_after=datetime.now(timezone.utc) + timedelta(seconds=retry_delay(attempts)))
+    else:
+        values.update(status="failed", finished_at=datetime.now(timezone.utc))
+
+    if not _release_owned(db, job_id, worker_id, **values):
+        db.rollback()
+        return None
+    db.execute(
+        update(Order.__table__)
+        .where(Order.id == order_id)
+        .values(ocr_status="queued" if will_retry else "failed")
+    )
+    db.commit()
+    return will_retry
+
+
+# ==========================================
+# 2. THE WORKER
+# ==========================================
+class OcrWorker:
+    """
+    Pulls OCR jobs from the `ocr_jobs` table and runs them.
+
+    - Tesseract runs in a ProcessPoolExecutor of OCR_WORKER_CONCURRENCY
+      processes, so OCR never competes with the API for the GIL
+    - Each job's DB work (image lookup, matching, saving suggestions) runs in
+      a thread; at most OCR_WORKER_CONCURRENCY jobs are in flight
+    - Jobs are claimed only when a slot is free, so a busy worker leaves the
+      rest of the queue to other workers
+    - New jobs wake it up immediately in the same process; otherwise it polls
+      every OCR_POLL_INTERVAL_SECONDS (jobs queued by other processes, retries)
+
+    Runs embedded in the API (OCR_WORKER_EMBEDDED) or on its own:
+        python -m app.services.ocr_worker
+    """
+
+    def __init__(self):
+        self.worker_id = f"{os.uname().nodename}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._jobs: Set[asyncio.Task] = set()
+
+    async def start(self):
+        concurrency = settings.OCR_WORKER_CONCURRENCY
+        self._loop = asyncio.get_running_loop()
+        self._pool = self._new_pool()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        print(f"🤖 OCR worker {self.worker_id} started ({concurrency} process(es))")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Let running jobs finish; anything still running after the grace period
+        # is picked up again by another worker once its lease runs out
+        if self._jobs:
+            await asyncio.wait(self._jobs, timeout=settings.OCR_SHUTDOWN_GRACE_SECONDS)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+    @staticmethod
+    def _new_pool() -> ProcessPoolExecutor:
+        # "spawn": never fork a process that already has an event loop and DB connections
+        return ProcessPoolExecutor(
+            max_workers=settings.OCR_WORKER_CONCURRENCY,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def notify(self):
+        """A job was just queued. Safe to call from any thread; no-op if no worker runs here."""
+        if self._loop is not None and self._task is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            free = 1
+            while free < settings.OCR_WORKER_CONCURRENCY and not self._slots.locked():
+                await self._slots.acquire()
+                free += 1
+
+            self._wakeup.clear()
+            try:
+                jobs = await asyncio.to_thread(self._claim, free)
+            except Exception as e:
+                print(f"❌ OCR worker could not claim jobs: {e}")
+                jobs = []
+
+            for job in jobs:
+                task = asyncio.create_task(self._process(job))
+                self._jobs.add(task)
+                task.add_done_callback(self._jobs.discard)
+            for _ in range(free - len(jobs)):
+                self._slots.release()
+
+            if len(jobs) < free:
+                # Queue drained — sleep until a new job or the next poll
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.OCR_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _process(self, job):
+        pool = self._pool
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await asyncio.to_thread(process_chitty_order, job.order_id, pool, job.id)
+            heartbeat.cancel()
+            if not await asyncio.to_thread(self._finish, complete_job, job.id, job.order_id, self.worker_id):
+                print(f"⚠️ OCR job {job.id} finished after its lease was lost — another worker owns it now")
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, BrokenProcessPool) and pool is self._pool:
+                # A Tesseract process crashed (or was OOM-killed) — the pool is unusable from now on
+                print("⚠️ OCR process pool broke, starting a new one")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+            try:
+                will_retry = await asyncio.to_thread(
+                    self._finish, fail_job, job.id, job.order_id, job.attempts, error, self.worker_id
+                )
+                if will_retry is None:
+                    print(f"⚠️ OCR job {job.id} failed after its lease was lost — left to its new owner: {error}")
+                else:
+                    print(f"❌ OCR job {job.id} failed (attempt {job.attempts}, {'will retry' if will_retry else 'giving up'}): {error}")
+            except Exception as db_error:
+                print(f"❌ OCR job {job.id} failed and could not be rescheduled: {db_error}")
+        finally:
+            heartbeat.cancel()
+            self._slots.release()
+
+    async def _heartbeat(self, job):
+        """Renew the job's lease every third of OCR_JOB_LEASE_SECONDS, so a slow job isn't taken as orphaned."""
+        interval = settings.OCR_JOB_LEASE_SECONDS / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await asyncio.to_thread(self._finish, renew_lease, job.id, self.worker_id):
+                    print(f"⚠️ OCR job {job.id} lease was lost — another worker may run it too")
+                    return
+            except Exception as e:
+                print(f"⚠️ OCR job {job.id} lease renewal failed: {e}")
+
+    def _claim(self, limit: int) -> List:
+        db = SessionLocal()
+        try:
+            return claim_jobs(db, self.worker_id, limit)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _finish(step, *args):
+        db = SessionLocal()
+        try:
+            return step(db, *args)
+        finally:
+            db.close()
+
+
+# Single global instance — started in app/main.py when OCR_WORKER_EMBEDDED
+ocr_worker = OcrWorker()
+
+
+# ==========================================
+# 3. STANDALONE ENTRY POINT
+# ==========================================
+async def main():
+    from app.core.ws_manager import manager
+
+    # Joins the WebSocket broker so "chitty processed" reaches merchants connected
+    # to the API workers (needs WS_BROKER=postgres when running separately)
+    await manager.start()
+    await ocr_worker.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    print("🛑 OCR worker stopping...")
+    await ocr_worker.stop()
+    await manager.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,375 @@
+import heapq
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.inventory import InventoryItem
+from app.models.product import Product
+
+# Only suggest if confidence is reasonable (> 40%)
+MATCH_THRESHOLD = 0.4
+# Line contains the product name (or vice-versa) → at least this confident
+PARTIAL_MATCH_SCORE = 0.75
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def ngrams(text: str, n: int = 3) -> Set[str]:
+    """Character n-grams of the normalized text, padded so short words and word edges count too."""
+    padded = f" {normalize(text)} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def score_match(line_lower: str, name_lower: str) -> float:
+    """The exact score (unchanged from the full scan): SequenceMatcher ratio, boosted for containment."""
+    # SequenceMatcher gives a ratio between 0.0 and 1.0
+    score = SequenceMatcher(None, line_lower, name_lower).ratio()
+    # Also check if the line CONTAINS the product name (partial match)
+    if name_lower in line_lower or line_lower in name_lower:
+        score = max(score, PARTIAL_MATCH_SCORE)
+    return score
+
+
+# ==========================================
+# 1. THE INDEX (character trigram → products)
+# ==========================================
+class ProductIndex:
+    """
+    An inverted index from character trigrams to products.
+
+    Matching a line no longer means running SequenceMatcher against the whole
+    catalog: the line's trigrams pick the OCR_MATCH_CANDIDATES products that
+    share the most (IDF-weighted, so "atta" counts more than " sa") and only
+    those get the exact SequenceMatcher score.
+
+    Pure in-memory structure — `add` / `remove` keep it current without a rebuild.
+    """
+
+    def __init__(self):
+        # { product_id: (name, name_lower) }
+        self.products: Dict[object, Tuple[str, str]] = {}
+        # { product_id: its trigrams } and { trigram: {product_id, ...} }
+        self._grams: Dict[object, Set[str]] = {}
+        self._postings: Dict[str, Set[object]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def add(self, product_id, name: str):
+        if product_id in self.products:
+            self.remove(product_id)
+        grams = ngrams(name)
+        self.products[product_id] = (name, name.lower())
+        self._grams[product_id] = grams
+        for gram in grams:
+            self._postings[gram].add(product_id)
+
+    def remove(self, product_id):
+        grams = self._grams.pop(product_id, None)
+        if grams is None:
+            return
+        del self.products[product_id]
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(product_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def candidates(self, line: str, limit: int) -> List[object]:
+        """The `limit` products sharing the most line trigrams (IDF-weighted, length-normalized)."""
+        query = ngrams(line)
+        total = len(self.products)
+        scores: Dict[object, float] = defaultdict(float)
+        for gram in query:
+            posting = self._postings.get(gram)
+            if not posting:
+                continue
+            idf = math.log(1 + total / len(posting))
+            for product_id in posting:
+                scores[product_id] += idf
+
+        if not scores:
+            return []
+        # Normalize by the product's own trigram count, so long names don't win just by being long
+        return heapq.nlargest(
+            limit, scores, key=lambda pid: scores[pid] / math.sqrt(len(self._grams[pid]))
+        )
+
+
+# ==========================================
+# 2. MATCHING (pure — no DB)
+# ==========================================
+def match_lines(lines: Iterable[str], index: ProductIndex, candidates: Optional[int] = None) -> List[Dict]:
+    """
+    For each OCR line, the best product among its index candidates.
+
+    Returns a list of dicts:
+    [{ "extracted_text": "...", "product_id": ..., "product_name": "...", "confidence": 0.85 }]
+    """
+    limit = candidates or settings.OCR_MATCH_CANDIDATES
+    results = []
+    for line in lines:
+        line_lower = line.lower()
+
+        best_id, best_score = None, 0.0
+        for product_id in index.candidates(line, limit):
+            score = score_match(line_lower, index.products[product_id][1])
+            if score > best_score:
+                best_id, best_score = product_id, score
+
+        if best_id is not None and best_score > MATCH_THRESHOLD:
+            results.append({
+                "extracted_text": line,
+                "product_id": best_id,
+                "product_name": index.products[best_id][0],
+                "confidence": round(best_score, 2),
+            })
+        else:
+            # No good match found — still record the line
+            results.append({"extracted_text": line, "product_id": None, "product_name": None, "confidence": 0.0})
+    return results
+
+
+# ==========================================
+# 3. THE CATALOG INDEX (built once, kept current)
+# ==========================================
+class CatalogIndex:
+    """
+    The process-wide index of every active product.
+
+    - Built from the database on first use (id + name only)
+    - Product writes committed in this process are applied right away
+      (session hooks below)
+    - Writes from other processes are picked up by a throttled refresh: at
+      most every OCR_INDEX_REFRESH_SECONDS, products changed since the last
+      refresh are re-read (by `updated_at`); if the active count still
+      disagrees (hard deletes), the index is rebuilt
+
+    The index is updated in place, so matching against it goes through
+    `match()`, which holds the same lock (matching is pure Python and holds
+    the GIL anyway, so concurrent jobs lose nothing by taking turns).
+    """
+
+    # Re-read this much before the watermark: updated_at is the writer's
+    # transaction start, which can be earlier than its commit
+    OVERLAP = timedelta(seconds=60)
+
+    def __init__(self):
+        self._index: Optional[ProductIndex] = None
+        self._watermark: Optional[datetime] = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    def get(self, db: Session) -> ProductIndex:
+        with self._lock:
+            if self._index is None:
+                self._rebuild(db)
+            elif time.monotonic() - self._checked_at >= settings.OCR_INDEX_REFRESH_SECONDS:
+                self._refresh(db)
+            return self._index
+
+    def match(self, db: Session, lines: List[str]) -> List[Dict]:
+        with self._lock:
+            return match_lines(lines, self.get(db))
+
+    def _rebuild(self, db: Session):
+        index = ProductIndex()
+        watermark = None
+        rows = db.query(Product.id, Product.name, Product.updated_at).filter(Product.is_active == True)
+        for product_id, name, updated_at in rows:
+            index.add(product_id, name)
+            if updated_at is not None and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+        self._index, self._watermark = index, watermark
+        self._checked_at = time.monotonic()
+        print(f"🔎 Product match index built: {len(index)} products")
+
+    def _refresh(self, db: Session):
+        self._checked_at = time.monotonic()
+        query = db.query(Product.id, Product.name, Product.is_active, Product.updated_at)
+        if self._watermark is not None:
+            query = query.filter(Product.updated_at > self._watermark - self.OVERLAP)
+        for product_id, name, is_active, updated_at in query:
+            self._apply(product_id, name, is_active)
+            if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+        active = db.query(func.count(Product.id)).filter(Product.is_active == True).scalar()
+        if active != len(self._index):
+            self._rebuild(db)
+
+    def _apply(self, product_id, name: str, is_active: bool):
+        if is_active:
+            self._index.add(product_id, name)
+        else:
+            self._index.remove(product_id)
+
+    def apply_changes(self, changes: Dict[object, Optional[Tuple[str, bool]]]):
+        """Committed product writes from this process: { id: (name, is_active) or None if deleted }."""
+        with self._lock:
+            if self._index is None:
+                return  # Not built yet — the first build reads them anyway
+            for product_id, change in changes.items():
+                if change is None:
+                    self._index.remove(product_id)
+                else:
+                    self._apply(product_id, *change)
+
+
+class ShopIndexCache:
+    """
+    One index per shop, built from that shop's InventoryItem rows — a chitty
+    goes to one shop, so its lines are matched against what the shop sells
+    first (far fewer candidates, no suggestions the shop can't fill).
+
+    - The OCR_SHOP_INDEX_CACHE_SIZE most recently used shops are kept (LRU)
+    - Inventory rows added / removed / re-pointed in this process drop that
+      shop's index after the commit; product renames and deactivations drop
+      the indexes containing the product
+    - Other processes' changes are picked up by rebuilding an index once it
+      is OCR_SHOP_INDEX_TTL_SECONDS old
+
+    A shop's index is never changed after it is built (invalidation replaces
+    it), so it can be matched against without a lock. Builds run outside the
+    lock; an invalidation that lands during one bumps a generation counter,
+    and the (possibly stale) result is then used once but not cached.
+    """
+
+    def __init__(self):
+        # { shop_id: (index, built_at_monotonic) } — least recently used first
+        self._indexes: "OrderedDict[str, Tuple[ProductIndex, float]]" = OrderedDict()
+        # { shop_id: invalidations so far } and product invalidations (any shop may hold the product)
+        self._generations: Dict[str, int] = {}
+        self._product_generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, shop_id) -> ProductIndex:
+        key = str(shop_id)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached and time.monotonic() - cached[1] < settings.OCR_SHOP_INDEX_TTL_SECONDS:
+                self._indexes.move_to_end(key)
+                return cached[0]
+            generation = (self._generations.get(key, 0), self._product_generation)
+
+        # Built outside the lock so one big shop doesn't hold up the others
+        index = self._build(db, shop_id)
+        with self._lock:
+            if generation != (self._generations.get(key, 0), self._product_generation):
+                return index  # Invalidated while building — don't keep what may be stale
+            self._indexes[key] = (index, time.monotonic())
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > settings.OCR_SHOP_INDEX_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        return index
+
+    @staticmethod
+    def _build(db: Session, shop_id) -> ProductIndex:
+        index = ProductIndex()
+        rows = (
+            db.query(Product.id, Product.name)
+            .join(InventoryItem, InventoryItem.product_id == Product.id)
+            .filter(InventoryItem.shop_id == shop_id, Product.is_active == True)
+        )
+        for product_id, name in rows:
+            index.add(product_id, name)
+        return index
+
+    def invalidate_shops(self, shop_ids: Iterable):
+        with self._lock:
+            for shop_id in shop_ids:
+                key = str(shop_id)
+                self._indexes.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def invalidate_products(self, product_ids: Iterable):
+        product_ids = set(product_ids)
+        with self._lock:
+            self._product_generation += 1
+            stale = [
+                key for key, (index, _) in self._indexes.items()
+                if any(pid in index.products for pid in product_ids)
+            ]
+            for key in stale:
+                del self._indexes[key]
+
+
+# Single global instances (per process)
+catalog_index = CatalogIndex()
+shop_indexes = ShopIndexCache()
+
+
+def match_shop_lines(lines: List[str], db: Session, shop_id) -> List[Dict]:
+    """
+    Match against the shop's own inventory; only lines with no match there
+    fall back to the whole catalog.
+    """
+    results = match_lines(lines, shop_indexes.get(db, shop_id))
+    unmatched = [i for i, result in enumerate(results) if result["product_id"] is None]
+    if unmatched:
+        fallback = catalog_index.match(db, [lines[i] for i in unmatched])
+        for i, result in zip(unmatched, fallback):
+            results[i] = result
+    return results
+
+
+# ==========================================
+# 4. KEEP IT CURRENT (only after the write commits)
+# ==========================================
+def _inventory_shops_changed(item: InventoryItem, is_new_or_deleted: bool) -> Set:
+    """Shops whose product list this row changes (stock / price edits don't matter for matching)."""
+    if is_new_or_deleted:
+        return {item.shop_id}
+    state = inspect(item)
+    shops = set()
+    if state.attrs.product_id.history.has_changes() or state.attrs.shop_id.history.has_changes():
+        shops.add(item.shop_id)
+        shops.update(state.attrs.shop_id.history.deleted)
+    return shops
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_product_changes(session: Session, flush_context):
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Product):
+            session.info.setdefault("product_changes", {})[obj.id] = (obj.name, bool(obj.is_active))
+        elif isinstance(obj, InventoryItem):
+            shops = _inventory_shops_changed(obj, obj in session.new)
+            if shops:
+                session.info.setdefault("inventory_shops_changed", set()).update(shops)
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            session.info.setdefault("product_changes", {})[obj.id] = None
+        elif isinstance(obj, InventoryItem):
+            session.info.setdefault("inventory_shops_changed", set()).add(obj.shop_id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_product_changes(session: Session):
+    changes = session.info.pop("product_changes", None)
+    if changes:
+        catalog_index.apply_changes(changes)
+        shop_indexes.invalidate_products(changes)
+    shops = session.info.pop("inventory_shops_changed", None)
+    if shops:
+        shop_indexes.invalidate_shops(shops)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_product_changes(session: Session):
+    session.info.pop("product_changes", None)
+    session.info.pop("inventory_shops_changed", None)
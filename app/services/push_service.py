@@ -0,0 +1,251 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+
+@dataclass
+class PushMessage:
+    token: str
+    title: str
+    body: str
+    data: Dict[str, str] = field(default_factory=dict)
+
+
+class FcmPushDispatcher:
+    """
+    Delivers native pushes through the FCM HTTP v1 API, off the request path.
+
+    - `enqueue()` never blocks: callers (send_notification) drop the message on
+      an in-memory queue and return immediately.
+    - FCM_WORKERS consumer tasks each pull up to FCM_BATCH_SIZE messages (waiting
+      at most FCM_BATCH_WINDOW_MS to fill a batch) and send the whole batch
+      concurrently over one pooled keep-alive HTTP client.
+    - 429 / 5xx / network errors are retried with exponential backoff + jitter,
+      honouring Retry-After.
+    - Tokens FCM reports as UNREGISTERED / invalid are cleared from
+      `users.fcm_token` in one UPDATE per batch.
+
+    FCM_ENDPOINT is configurable so tests and local dev can point it at
+    `app/scripts/fake_fcm_server.py` instead of Google.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._workers: List[asyncio.Task] = []
+        self._access_token: Optional[str] = None
+        self._access_token_expires_at = 0.0
+        self._credentials = None
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if not settings.FCM_ENABLED:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.FCM_QUEUE_SIZE)
+        self._client = httpx.AsyncClient(
+            base_url=settings.FCM_ENDPOINT,
+            timeout=settings.FCM_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.FCM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.FCM_MAX_CONNECTIONS,
+            ),
+        )
+        self._workers = [asyncio.create_task(self._run()) for _ in range(settings.FCM_WORKERS)]
+        print(f"📲 FCM dispatcher started ({settings.FCM_WORKERS} worker(s) → {settings.FCM_ENDPOINT})")
+
+    async def stop(self):
+        # Give queued pushes a moment to drain before shutting down
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=5)
+            except asyncio.TimeoutError:
+                print(f"⚠️ FCM dispatcher stopping with {self._queue.qsize()} undelivered push(es)")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def enqueue(self, token: str, title: str, body: str, data: Optional[dict] = None) -> bool:
+        """
+        Queue one push. Returns False if the dispatcher isn't running (FCM
+        disabled) so the caller can fall back. Must be called on the event loop.
+        """
+        if not self.is_running:
+            return False
+
+        message = PushMessage(
+            token=token,
+            title=title,
+            body=body,
+            # FCM data payloads only accept string values
+            data={k: str(v) for k, v in (data or {}).items() if v is not None and not isinstance(v, (dict, list))},
+        )
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            print(f"⚠️ FCM queue full, dropping push '{title}'")
+        return True
+
+    # ------------------------------------------
+    # Workers
+    # ------------------------------------------
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + settings.FCM_BATCH_WINDOW_MS / 1000
+            while len(batch) < settings.FCM_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._send_batch(batch)
+            except Exception as e:
+                print(f"❌ FCM batch error: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _send_batch(self, batch: List[PushMessage]):
+        results = await asyncio.gather(*(self._send_one(m) for m in batch))
+        invalid_tokens = {m.token for m, ok in zip(batch, results) if ok is None}
+        if invalid_tokens:
+            pruned = await asyncio.to_thread(prune_invalid_tokens, invalid_tokens)
+            print(f"🧹 Pruned {pruned} invalid FCM token(s)")
+
+    async def _send_one(self, message: PushMessage) -> Optional[bool]:
+        """True = delivered, False = gave up, None = the token is invalid (prune it)."""
+        path = f"/v1/projects/{settings.FCM_PROJECT_ID}/messages:send"
+        payload = {
+            "message": {
+                "token": message.token,
+                "notification": {"title": message.title, "body": message.body},
+                "data": message.data,
+            }
+        }
+
+        for attempt in range(settings.FCM_MAX_RETRIES + 1):
+            retry_after = None
+            try:
+                response = await self._client.post(path, json=payload, headers=await self._auth_headers())
+            except httpx.HTTPError as e:
+                print(f"⚠️ FCM network error (attempt {attempt + 1}): {e}")
+            else:
+                if response.status_code == 200:
+                    return True
+                if _is_invalid_token(response):
+                    return None
+                if response.status_code == 404:
+                    # Not an UNREGISTERED token → the URL itself is wrong; keep the token
+                    print(f"❌ FCM returned 404 — check FCM_PROJECT_ID / FCM_ENDPOINT: {response.text[:200]}")
+                    return False
+                if response.status_code != 429 and response.status_code < 500:
+                    print(f"❌ FCM rejected push ({response.status_code}): {response.text[:200]}")
+                    return False
+                retry_after = _retry_after_seconds(response)
+
+            if attempt < settings.FCM_MAX_RETRIES:
+                backoff = settings.FCM_RETRY_BASE_SECONDS * (2 ** attempt)
+                await asyncio.sleep(max(retry_after or 0, backoff) + random.uniform(0, backoff / 2))
+
+        print(f"❌ FCM push '{message.title}' failed after {settings.FCM_MAX_RETRIES + 1} attempt(s)")
+        return False
+
+    # ------------------------------------------
+    # Auth
+    # ------------------------------------------
+    async def _auth_headers(self) -> Dict[str, str]:
+        """
+        Static FCM_ACCESS_TOKEN (fake server / short-lived testing), or an OAuth2
+        token minted from FCM_SERVICE_ACCOUNT_FILE (needs the optional
+        google-auth package), or no auth at all for the local fake server.
+        """
+        if settings.FCM_ACCESS_TOKEN:
+            return {"Authorization": f"Bearer {settings.FCM_ACCESS_TOKEN}"}
+        if not settings.FCM_SERVICE_ACCOUNT_FILE:
+            return {}
+
+        if self._access_token is None or time.time() > self._access_token_expires_at - 60:
+            self._access_token, self._access_token_expires_at = await asyncio.to_thread(self._refresh_access_token)
+        return {"Authorization": f"Bearer {self._access_token}"}
+
+    def _refresh_access_token(self):
+        from google.oauth2 import service_account
+        from google.auth.transport.requests import Request
+
+        if self._credentials is None:
+            self._credentials = service_account.Credentials.from_service_account_file(
+                settings.FCM_SERVICE_ACCOUNT_FILE,
+                scopes=["https://www.googleapis.com/auth/firebase.messaging"],
+            )
+        self._credentials.refresh(Request())
+        # google-auth's expiry is a naive UTC datetime — .timestamp() alone would read it as local time
+        return self._credentials.token, self._credentials.expiry.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _is_invalid_token(response: httpx.Response) -> bool:
+    """
+    FCM v1 reports dead tokens as UNREGISTERED (in `error.details[].errorCode`)
+    or 400 INVALID_ARGUMENT naming the registration token. A bare 404 NOT_FOUND
+    is NOT one: a wrong FCM_PROJECT_ID / FCM_ENDPOINT returns it for every send.
+    """
+    if response.status_code not in (400, 404):
+        return False
+    try:
+        error = response.json().get("error", {})
+    except ValueError:
+        return False
+    for detail in error.get("details", []):
+        if detail.get("errorCode") == "UNREGISTERED":
+            return True
+    return (
+        response.status_code == 400
+        and error.get("status") == "INVALID_ARGUMENT"
+        and "registration token" in error.get("message", "")
+    )
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def prune_invalid_tokens(tokens) -> int:
+    """Clear dead tokens from every user holding them, in one UPDATE."""
+    from app.models.user import User
+
+    db = SessionLocal()
+    try:
+        pruned = (
+            db.query(User)
+            .filter(User.fcm_token.in_(list(tokens)))
+            .update({"fcm_token": None}, synchronize_session=False)
+        )
+        db.commit()
+        return pruned
+    finally:
+        db.close()
+
+
+# Single global instance — started in app/main.py
+push_dispatcher = FcmPushDispatcher()
@@ -0,0 +1,248 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.inventory import InventoryItem
+from app.models.order import Order, OrderItem
+from app.models.stock_hold import StockHold
+from app.services.live_updates import queue_inventory_update
+from app.services.low_stock import note_stock_change
+
+
+# ==========================================
+# 1. TAKE STOCK OFF THE SHELF (Atomic)
+# ==========================================
+def take_stock(db: Session, inventory_item_id: UUID, quantity: int) -> Optional[int]:
+    """
+    Decrement stock only if enough is left, in a single UPDATE.
+    Returns the new stock level, or None if there wasn't enough.
+    Two carts racing for the last unit can't both win this.
+    """
+    stmt = (
+        update(InventoryItem.__table__)
+        .where(
+            InventoryItem.id == inventory_item_id,
+            InventoryItem.stock >= quantity,
+        )
+        .values(stock=InventoryItem.stock - quantity)
+        .returning(
+            InventoryItem.stock,
+            InventoryItem.reorder_level,
+            InventoryItem.shop_id,
+            InventoryItem.product_id,
+        )
+    )
+    row = db.execute(stmt).first()
+    if row is None:
+        return None
+
+    note_stock_change(
+        db, inventory_item_id, row.shop_id, row.product_id,
+        row.stock + quantity, row.stock, row.reorder_level,
+    )
+    queue_inventory_update(db, row.shop_id, inventory_item_id, row.product_id, row.stock)
+    return row.stock
+
+
+def return_stock(db: Session, inventory_item_id: UUID, quantity: int) -> Optional[int]:
+    """Put held units back on the shelf. Returns the new stock level."""
+    stmt = (
+        update(InventoryItem.__table__)
+        .where(InventoryItem.id == inventory_item_id)
+        .values(stock=InventoryItem.stock + quantity)
+        .returning(InventoryItem.stock, InventoryItem.shop_id, InventoryItem.product_id)
+    )
+    row = db.execute(stmt).first()
+    if row is None:
+        return None
+
+    queue_inventory_update(db, row.shop_id, inventory_item_id, row.product_id, row.stock)
+    return row.stock
+
+
+# ==========================================
+# 2. CREATE A CART HOLD
+# ==========================================
+def reserve_stock(
+    db: Session,
+    inventory_item: InventoryItem,
+    customer_id: UUID,
+    quantity: int,
+) -> Optional[StockHold]:
+    """
+    Take `quantity` units off the shelf and record who is holding them.
+    Returns None when the shop doesn't have enough stock.
+    The caller commits.
+    """
+    if take_stock(db, inventory_item.id, quantity) is None:
+        return None
+
+    hold = StockHold(
+        inventory_item_id=inventory_item.id,
+        shop_id=inventory_item.shop_id,
+        product_id=inventory_item.product_id,
+        customer_id=customer_id,
+        quantity=quantity,
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=settings.CART_HOLD_TTL_MINUTES),
+    )
+    db.add(hold)
+    db.flush()
+    return hold
+
+
+# ==========================================
+# 3. CONSUME A HOLD AT CHECKOUT
+# ==========================================
+def consume_hold(
+    db: Session,
+    hold_id: UUID,
+    customer_id: UUID,
+    shop_id: UUID,
+    product_id: UUID,
+):
+    """
+    Delete a live hold and hand its (inventory_item_id, quantity) to checkout.
+    The stock was already taken when the hold was created, so nothing is re-checked.
+    Returns None if the hold doesn't exist, isn't theirs, or has lapsed.
+
+    DELETE ... RETURNING makes this race-free against the expiry sweeper:
+    whichever statement deletes the row owns the stock.
+    """
+    stmt = (
+        delete(StockHold.__table__)
+        .where(
+            StockHold.id == hold_id,
+            StockHold.customer_id == customer_id,
+            StockHold.shop_id == shop_id,
+            StockHold.product_id == product_id,
+            StockHold.expires_at > func.now(),
+        )
+        .returning(StockHold.inventory_item_id, StockHold.quantity)
+    )
+    return db.execute(stmt).first()
+
+
+# ==========================================
+# 4. RELEASE HOLDS
+# ==========================================
+def release_hold(db: Session, hold_id: UUID, customer_id: UUID) -> bool:
+    """Customer removed the line from their cart: give the stock back now."""
+    stmt = (
+        delete(StockHold.__table__)
+        .where(StockHold.id == hold_id, StockHold.customer_id == customer_id)
+        .returning(StockHold.inventory_item_id, StockHold.quantity)
+    )
+    released = db.execute(stmt).first()
+    if released is None:
+        return False
+
+    return_stock(db, released.inventory_item_id, released.quantity)
+    return True
+
+
+def release_expired_holds(db: Session, batch_size: Optional[int] = None) -> int:
+    """
+    Give back the stock of every lapsed hold, one batch per statement:
+
+        WITH released AS (DELETE FROM stock_holds WHERE id IN (<lapsed, SKIP LOCKED>) RETURNING ...),
+             totals   AS (SELECT inventory_item_id, sum(quantity), count(*) FROM released GROUP BY 1)
+        UPDATE inventory_items SET stock = stock + totals.qty FROM totals ...
+
+    SKIP LOCKED lets several workers sweep at once without double-releasing.
+    Commits after each batch. Returns the number of holds released.
+    """
+    if batch_size is None:
+        batch_size = settings.CART_HOLD_SWEEP_BATCH
+
+    holds = StockHold.__table__
+    inventory = InventoryItem.__table__
+
+    lapsed = (
+        select(holds.c.id)
+        .where(holds.c.expires_at <= func.now())
+        .order_by(holds.c.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    released = (
+        delete(holds)
+        .where(holds.c.id.in_(lapsed.scalar_subquery()))
+        .returning(holds.c.inventory_item_id, holds.c.quantity)
+        .cte("released")
+    )
+    totals = (
+        select(
+            released.c.inventory_item_id,
+            func.sum(released.c.quantity).label("qty"),
+            func.count().label("holds"),
+        )
+        .group_by(released.c.inventory_item_id)
+        .cte("totals")
+    )
+    stmt = (
+        update(inventory)
+        .where(inventory.c.id == totals.c.inventory_item_id)
+        .values(stock=inventory.c.stock + totals.c.qty)
+        .returning(totals.c.holds, inventory.c.id, inventory.c.shop_id, inventory.c.product_id, inventory.c.stock)
+    )
+
+    total_released = 0
+    while True:
+        rows = db.execute(stmt).all()
+        for row in rows:
+            queue_inventory_update(db, row.shop_id, row.id, row.product_id, row.stock)
+        batch = sum(row.holds for row in rows)
+        db.commit()
+        total_released += batch
+        if batch < batch_size:
+            return total_released
+
+
+# ==========================================
+# 5. RESTORE STOCK FOR A CANCELLED ORDER
+# ==========================================
+def restore_order_stock(db: Session, order: Order) -> int:
+    """
+    Put every line of a cancelled order back on the shelf with one set-based UPDATE:
+
+        UPDATE inventory_items SET stock = stock + totals.qty
+        FROM (SELECT product_id, sum(quantity) AS qty FROM order_items
+              WHERE order_id = :order_id GROUP BY product_id) AS totals
+        WHERE inventory_items.shop_id = :shop_id AND inventory_items.product_id = totals.product_id
+
+    Runs inside the caller's transaction so it commits together with the status change.
+    Chitty-only lines (no product_id) never took stock, so they are skipped.
+    Returns the number of inventory rows restocked.
+    """
+    items = OrderItem.__table__
+    inventory = InventoryItem.__table__
+
+    totals = (
+        select(items.c.product_id, func.sum(items.c.quantity).label("qty"))
+        .where(items.c.order_id == order.id, items.c.product_id.isnot(None))
+        .group_by(items.c.product_id)
+        .subquery("totals")
+    )
+    stmt = (
+        update(inventory)
+        .where(
+            inventory.c.shop_id == order.shop_id,
+            inventory.c.product_id == totals.c.product_id,
+        )
+        .values(stock=inventory.c.stock + totals.c.qty)
+        .returning(inventory.c.id, inventory.c.product_id, inventory.c.stock)
+    )
+    rows = db.execute(stmt).all()
+    for row in rows:
+        queue_inventory_update(db, order.shop_id, row.id, row.product_id, row.stock)
+    return len(rows)
+
+
+def load_pending_holds(db: Session):
+    """(expires_at, hold_id) for every outstanding hold — used to rebuild the sweeper heap on startup."""
+    rows = db.query(StockHold.expires_at, StockHold.id).all()
+    return [(expires_at, str(hold_id)) for expires_at, hold_id in rows]
@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.ws_manager import manager
+from app.models.notification import NotificationCounter
+
+
+class UnreadCounter:
+    """
+    Per-user unread notification counts.
+
+    The `notification_counters` row is the source of truth and is changed with
+    one upsert in the same transaction as the notification insert / update, so
+    it can never drift from the inbox. Every new value coming back from the
+    database is mirrored in memory, so polling `/unread-count` is a dict lookup;
+    entries expire after UNREAD_COUNT_CACHE_SECONDS so a worker that didn't see
+    a change (multi-worker deploys) catches up quickly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # { user_id: (unread_count, expires_at_monotonic) }
+        self._cache: Dict[str, Tuple[int, float]] = {}
+
+    # ------------------------------------------
+    # Writes (inside the caller's transaction — they do NOT commit;
+    # call `remember()` with the result once the caller has committed)
+    # ------------------------------------------
+    def increment(self, db: Session, user_ids) -> Dict[str, int]:
+        """+1 for every user in one INSERT ... ON CONFLICT DO UPDATE. Returns the new counts."""
+        if not user_ids:
+            return {}
+
+        table = NotificationCounter.__table__
+        # Sorted so concurrent fan-outs lock counter rows in the same order
+        stmt = pg_insert(table).values([
+            {"user_id": uid, "unread_count": 1} for uid in sorted(user_ids, key=str)
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"unread_count": table.c.unread_count + stmt.excluded.unread_count},
+        ).returning(table.c.user_id, table.c.unread_count)
+
+        return {str(uid): count for uid, count in db.execute(stmt).all()}
+
+    def decrement(self, db: Session, user_id, amount: int) -> Dict[str, int]:
+        """-amount for one user (never below zero). Returns the new count."""
+        if amount <= 0:
+            return {}
+
+        table = NotificationCounter.__table__
+        stmt = (
+            update(table)
+            .where(table.c.user_id == user_id)
+            .values(unread_count=func.greatest(table.c.unread_count - amount, 0))
+            .returning(table.c.user_id, table.c.unread_count)
+        )
+        return {str(uid): count for uid, count in db.execute(stmt).all()}
+
+    def remember(self, counts: Dict[str, int]):
+        expires_at = time.monotonic() + settings.UNREAD_COUNT_CACHE_SECONDS
+        with self._lock:
+            for uid, count in counts.items():
+                self._cache[uid] = (count, expires_at)
+
+    # ------------------------------------------
+    # Reads
+    # ------------------------------------------
+    def get(self, db: Session, user_id) -> int:
+        uid = str(user_id)
+        with self._lock:
+            cached: Optional[Tuple[int, float]] = self._cache.get(uid)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        count = (
+            db.query(NotificationCounter.unread_count)
+            .filter(NotificationCounter.user_id == user_id)
+            .scalar()
+        ) or 0
+        self.remember({uid: count})
+        return count
+
+    # ------------------------------------------
+    # Push
+    # ------------------------------------------
+    async def push(self, counts: Dict[str, int]):
+        """Tell connected clients their new badge count so they can stop polling."""
+        for uid, count in counts.items():
+            if manager.is_connected(uid):
+                await manager.send_to_user(uid, {"type": "unread_count", "unread_count": count})
+
+
+# Single global instance — imported everywhere
+unread_counter = UnreadCounter()
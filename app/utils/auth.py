@@ -10,6 +10,18 @@ from app.models.user import User
 # This tells Swagger UI to just ask for the Token string, no username/password form!
 security = HTTPBearer()
 
+def decode_access_token(token: str) -> str:
+    """
+    Verify the JWT and return the user ID in its `sub` claim.
+    Raises jwt.PyJWTError if the token is invalid/expired or has no subject.
+    Shared by get_current_user and the WebSocket handshake.
+    """
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise jwt.InvalidTokenError("Token has no subject")
+    return user_id
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     # Extract the actual token string from the credentials object
     token = credentials.credentials 
@@ -22,11 +34,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     
     try:
         # 1. Decrypt the token
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-            
+        user_id: str = decode_access_token(token)
     except jwt.PyJWTError:
         raise credentials_exception
 
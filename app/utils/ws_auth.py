@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+import jwt
+from fastapi import WebSocket
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.ws_manager import manager
+from app.db.session import SessionLocal
+from app.utils.auth import decode_access_token
+
+
+# ==========================================
+# 1. ADMISSION (per-worker token bucket)
+# ==========================================
+class TokenBucket:
+    """
+    Admits WS_ADMISSION_RATE handshakes per second with bursts up to
+    WS_ADMISSION_BURST. After a rollout every client reconnects at once; the
+    ones over the limit are turned away before any token is checked, so the
+    storm never reaches the database — they retry with backoff.
+    """
+
+    def __init__(self):
+        self._tokens = float(settings.WS_ADMISSION_BURST)
+        self._updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(
+            settings.WS_ADMISSION_BURST,
+            self._tokens + (now - self._updated) * settings.WS_ADMISSION_RATE,
+        )
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+# ==========================================
+# 2. PRINCIPAL CACHE (user_id → exists & active?, short TTL)
+# ==========================================
+class PrincipalCache:
+    """
+    Remembers whether a user exists and is active for WS_AUTH_CACHE_SECONDS,
+    so reconnects (flaky networks, several devices, reconnect storms) verify
+    the JWT in memory instead of loading the User every time.
+
+    Concurrent handshakes for the same uncached user share ONE lookup.
+    Deactivating a user invalidates this worker's entry at once; other
+    workers notice within the TTL. invalidate() is called from request
+    threads, so every touch of the LRU dict holds a (never contended for
+    long) lock — a pop between a lookup and its move_to_end would raise.
+    """
+
+    def __init__(self):
+        # { user_id: (is_active or None if no such user, expires_at_monotonic) }
+        # LRU order, capped at WS_AUTH_CACHE_SIZE
+        self._cache: "OrderedDict[str, Tuple[Optional[bool], float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    async def is_active(self, user_id: str) -> Optional[bool]:
+        """True / False for an active / deactivated user, None if there is no such user."""
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached and cached[1] > time.monotonic():
+                self._cache.move_to_end(user_id)
+                return cached[0]
+
+        future = self._inflight.get(user_id)
+        if future is None:
+            future = asyncio.ensure_future(asyncio.to_thread(self._load, user_id))
+            self._inflight[user_id] = future
+            future.add_done_callback(lambda f: self._store(user_id, f))
+        return await asyncio.shield(future)
+
+    def _store(self, user_id: str, future: asyncio.Future):
+        self._inflight.pop(user_id, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._lock:
+            self._cache[user_id] = (future.result(), time.monotonic() + settings.WS_AUTH_CACHE_SECONDS)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > settings.WS_AUTH_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _load(user_id: str) -> Optional[bool]:
+        """Runs in a worker thread (blocking DB call)."""
+        from app.models.user import User
+
+        db = SessionLocal()
+        try:
+            row = db.query(User.is_active).filter(User.id == UUID(user_id)).first()
+            return None if row is None else bool(row.is_active)
+        finally:
+            db.close()
+
+    def invalidate(self, user_id):
+        """Forget a user right away (e.g. just deactivated). Safe to call from request threads."""
+        with self._lock:
+            self._cache.pop(str(user_id), None)
+
+
+# Single global instances (per worker)
+admission = TokenBucket()
+principal_cache = PrincipalCache()
+
+
+# ==========================================
+# 3. HANDSHAKE
+# ==========================================
+def _token_from(websocket: WebSocket) -> Optional[str]:
+    """`?token=<jwt>` (browsers can't set headers on WebSockets) or `Authorization: Bearer <jwt>`."""
+    token = websocket.query_params.get("token")
+    if token:
+        return token
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials
+    return None
+
+
+async def _reject(websocket: WebSocket, status_code: int, detail: str):
+    """Refuse the handshake with a real HTTP status if the server supports it, else a 1008 close."""
+    try:
+        await websocket.send_denial_response(JSONResponse({"detail": detail}, status_code=status_code))
+    except RuntimeError:
+        await websocket.close(code=1008)
+
+
+async def authenticate_websocket(websocket: WebSocket, user_id: str) -> bool:
+    """
+    Check a handshake BEFORE it is accepted. The token's subject must be the
+    user in the path, and that user must be active. Returns False (after
+    rejecting the handshake) if the connection should not go ahead.
+    """
+    # 1. Over this worker's admission rate → 429, the client retries with backoff
+    if not admission.take():
+        manager.metrics.throttled += 1
+        await _reject(websocket, 429, "Too many connection attempts, retry shortly")
+        return False
+
+    # 2. Verify the JWT (CPU only, no DB)
+    token = _token_from(websocket)
+    try:
+        token_user_id = decode_access_token(token) if token else None
+    except jwt.PyJWTError:
+        token_user_id = None
+
+    if token_user_id is None or token_user_id != user_id:
+        manager.metrics.unauthorized += 1
+        await _reject(websocket, 401, "Could not validate credentials")
+        return False
+
+    # 3. Existing, active user? (cached)
+    try:
+        active = await principal_cache.is_active(user_id)
+    except ValueError:  # Subject isn't a UUID
+        active = None
+    if active is None:
+        manager.metrics.unauthorized += 1
+        await _reject(websocket, 401, "Could not validate credentials")
+        return False
+    if not active:
+        manager.metrics.unauthorized += 1
+        await _reject(websocket, 403, "Your account has been deactivated.")
+        return False
+
+    return True